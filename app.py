@@ -1,14 +1,40 @@
-from flask import Flask, request, render_template_string, redirect, url_for
-import yfinance as yf
+import gzip
+import hashlib
+import os
+import re
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+
+from flask import (Flask, Response, g, request, render_template, redirect, url_for, jsonify, stream_template,
+                   stream_with_context)
+from markupsafe import escape
 import pandas as pd
-import ssl
-import urllib3
+from werkzeug.http import is_resource_modified
+
+try:
+    import brotli
+except ImportError:  # pages are then cached and served gzip-only
+    brotli = None
+
+import export
+import metrics
+import prefetch
+import records
+import screener
+import symbols
+from cli import fixtures_cli, prefetch_command, store_cli, symbols_cli
+from transform import extract_metrics, format_number, quarter_labels, transform_prices, transform_section
+from derived import DERIVED_METRICS, DERIVED_UNITS, cached_derive, derived_section
+from cache import TTLCache
+from fundamentals import (get_datasets, iter_datasets, iter_dataset_results, cache_stats, cached_at, lookup,
+                          retry_after, shared_cache, ttl_remaining, INFO_TTL)
 
 app = Flask(__name__)
-
-# Disable SSL warnings
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-ssl._create_default_https_context = ssl._create_unverified_context
+app.cli.add_command(store_cli)
+app.cli.add_command(fixtures_cli)
+app.cli.add_command(prefetch_command)
+app.cli.add_command(symbols_cli)
 
 # Theme colors and fonts
 TATA_BLUE = "#1268B3"
@@ -44,30 +70,166 @@ metrics_sections = {
     }
 }
 
-def format_number(val):
-    if val is None:
-        return "N/A"
-    try:
-        val = float(val)
-    except:
-        return str(val)
-    abs_val = abs(val)
-    if abs_val >= 1_000_000_000_000:
-        return f"{val / 1_000_000_000_000:.2f} Tn"
-    elif abs_val >= 1_000_000_000:
-        return f"{val / 1_000_000_000:.2f} Bn"
-    elif abs_val >= 1_000_000:
-        return f"{val / 1_000_000:.2f} Mn"
-    elif abs_val >= 100_000:
-        return f"{int(val // 10000 * 10000):,}"
-    elif abs_val >= 10_000:
-        return f"{int(val // 1000 * 1000):,}"
-    elif abs_val >= 1_000:
-        return f"{int(val // 100 * 100):,}"
-    elif abs_val >= 100:
-        return f"{int(val // 10 * 10):,}"
-    else:
-        return f"{val:.1f}"
+SECTION_DATASETS = {
+    "Income Statements": "financials",
+    "Balance Sheets": "balance_sheet",
+    "Cashflow": "cashflow"
+}
+
+# Ratios computed from all three statements, shown after them
+RATIOS = "Key Ratios"
+RATIOS_DATASET = "derived"
+
+# Quarterly statements, with the same rows as their annual counterparts
+QUARTERLY_SECTIONS = {
+    "Quarterly Income Statements": "Income Statements",
+    "Quarterly Balance Sheets": "Balance Sheets",
+    "Quarterly Cashflow": "Cashflow"
+}
+
+# Daily closes, downsampled for the chart
+PRICES = "Price History"
+
+# Dataset behind every section
+DATASET_OF = dict(SECTION_DATASETS, **{RATIOS: RATIOS_DATASET, PRICES: "history"},
+                  **{name: "quarterly_" + SECTION_DATASETS[annual] for name, annual in QUARTERLY_SECTIONS.items()})
+
+# Page order of every section
+SECTIONS = list(SECTION_DATASETS) + [RATIOS] + list(QUARTERLY_SECTIONS) + [PRICES]
+
+# Rendered when ?sections= is absent; the longer histories load when expanded
+DEFAULT_SECTIONS = list(SECTION_DATASETS) + [RATIOS]
+
+SECTION_TITLES = {
+    "Income Statements": "Income Statement",
+    "Balance Sheets": "Balance Sheet",
+    "Cashflow": "Cash Flow",
+    RATIOS: "Key Ratios",
+    "Quarterly Income Statements": "Quarterly Income Statement",
+    "Quarterly Balance Sheets": "Quarterly Balance Sheet",
+    "Quarterly Cashflow": "Quarterly Cash Flow",
+    PRICES: "Price History"
+}
+
+# Names accepted by ?sections= (the dataset names work too)
+SECTION_SLUGS = {
+    "Income Statements": "income",
+    "Balance Sheets": "balance",
+    "Cashflow": "cashflow",
+    RATIOS: "ratios",
+    "Quarterly Income Statements": "quarterly_income",
+    "Quarterly Balance Sheets": "quarterly_balance",
+    "Quarterly Cashflow": "quarterly_cashflow",
+    PRICES: "prices"
+}
+
+# Cached statements and price histories keep only the rows and columns the sections read
+records.keep(records.STATEMENT, (row for rows in metrics_sections.values() for row in rows.values()))
+records.keep(records.HISTORY, ("Close", "Volume"))
+
+# Rows per section for the peer comparison tables, with the unit their charts are in
+COMPARE_METRICS = dict(metrics_sections, **{RATIOS: DERIVED_METRICS})
+METRIC_UNITS = {name: DERIVED_UNITS[kind] for name, kind in DERIVED_METRICS.items()}
+
+def chart(chart_id, title, kind, series, options=None):
+    # options names a Chart.js options object from chart_options.html
+    return {"id": chart_id, "title": title, "type": kind,
+            "options": options or ('barOptions' if kind == 'bar' else 'commonOptions'),
+            "series": [{"label": label, "metric": metric, "color": color} for label, metric, color in series]}
+
+def quarterly_charts(rows):
+    # The annual layout again, on canvases of their own
+    return [[dict(c, id="q" + c["id"]) for c in row] for row in rows]
+
+# Chart rows rendered under each statement table; series values are in millions
+CHART_LAYOUT = {
+    "Income Statements": [
+        [chart("chart1", "Total Revenue vs Gross Profit", "line", [
+            ("Total Revenue (Mn)", "Total Revenue", TATA_BLUE),
+            ("Gross Profit (Mn)", "Gross Profit", DEEP_BLUE)]),
+         chart("chart2", "Operating Income vs Operating Expense", "line", [
+            ("Operating Income (Mn)", "Operating Income", "purple"),
+            ("Operating Expense (Mn)", "Operating Expense", "orange")])],
+        [chart("chart3", "Total Revenue vs EBITDA", "line", [
+            ("Total Revenue (Mn)", "Total Revenue", TATA_BLUE),
+            ("EBITDA (Mn)", "EBITDA", "red")])]
+    ],
+    "Balance Sheets": [
+        [chart("chart5", "Total Assets vs Total Liabilities", "bar", [
+            ("Total Assets (Mn)", "Total Assets", TATA_BLUE),
+            ("Total Liabilities (Mn)", "Total Liab", DEEP_BLUE)]),
+         chart("chart6", "Long Term Debt vs Net Debt", "line", [
+            ("Long Term Debt (Mn)", "Long Term Debt", "orange"),
+            ("Net Debt (Mn)", "Net Debt", "brown")])]
+    ],
+    "Cashflow": [
+        [chart("chart7", "Operating vs Investing vs Financing Cash Flow", "line", [
+            ("Operating CF (Mn)", "Operating Cash Flow", "green"),
+            ("Investing CF (Mn)", "Investing Cash Flow", TATA_BLUE),
+            ("Financing CF (Mn)", "Financing Cash Flow", DEEP_BLUE)]),
+         chart("chart8", "Repayment of Debt", "line", [
+            ("Repayment of Debt (Mn)", "Repayment of Debt", "red")])]
+    ],
+    RATIOS: [
+        [chart("chart9", "Gross vs Operating vs Net Margin", "line", [
+            ("Gross Margin (%)", "Gross Margin", TATA_BLUE),
+            ("Operating Margin (%)", "Operating Margin", DEEP_BLUE),
+            ("Net Margin (%)", "Net Margin", "green")]),
+         chart("chart10", "Revenue Growth", "bar", [
+            ("Revenue YoY (%)", "Revenue Growth (YoY)", TATA_BLUE),
+            ("Revenue CAGR 3Y (%)", "Revenue CAGR (3Y)", "orange")])],
+        [chart("chart11", "Net Debt / EBITDA", "line", [
+            ("Net Debt / EBITDA (x)", "Net Debt / EBITDA", "brown")]),
+         chart("chart12", "Free Cash Flow", "bar", [
+            ("Free Cash Flow (Mn)", "Free Cash Flow", "green")])]
+    ]
+}
+CHART_LAYOUT.update({name: quarterly_charts(CHART_LAYOUT[annual]) for name, annual in QUARTERLY_SECTIONS.items()})
+CHART_LAYOUT[PRICES] = [
+    [chart("chart13", "Close Price", "line", [
+        ("Close", "Close", TATA_BLUE)], options='seriesOptions')]
+]
+
+# Quarters shown per quarterly section (years * 4, up to this) and the most
+# points any price chart gets, however long the history requested
+QUARTERLY_MAX_PERIODS = int(os.environ.get("QUARTERLY_MAX_PERIODS", 12))
+PRICE_POINTS = int(os.environ.get("PRICE_POINTS", 500))
+
+# Browser/CDN cache lifetimes (seconds) for the JSON data API and the static shell
+API_MAX_AGE = int(os.environ.get("API_MAX_AGE", 300))
+SHELL_MAX_AGE = int(os.environ.get("SHELL_MAX_AGE", 86400))
+
+# Longest a rendered /result page is cached (and may be cached by browsers);
+# each page also expires with the first of the datasets it shows
+PAGE_TTL = int(os.environ.get("PAGE_TTL", INFO_TTL))
+# Rendered pages each worker keeps in front of the shared cache, and how
+# hard they are compressed (once, when stored)
+PAGE_CACHE_ENTRIES = int(os.environ.get("PAGE_CACHE_ENTRIES", 512))
+PAGE_GZIP_LEVEL = 9
+PAGE_BROTLI_QUALITY = int(os.environ.get("PAGE_BROTLI_QUALITY", 5))
+
+# Upper bound on ?years=; price history is the only section with that much data
+MAX_YEARS = int(os.environ.get("MAX_YEARS", 100))
+
+# Peer comparison limits: tickers per request and overall fetch deadline (seconds)
+COMPARE_MAX_TICKERS = int(os.environ.get("COMPARE_MAX_TICKERS", 25))
+COMPARE_TIMEOUT = float(os.environ.get("COMPARE_TIMEOUT", 30))
+
+# Send /result progressively: head and profile once info is in, then each
+# statement section as its data arrives. The final page is the same either way.
+STREAM_RESULT = os.environ.get("STREAM_RESULT", "1") == "1"
+
+# Per-stage durations go to /metrics regardless; this only controls the response header
+SERVER_TIMING = os.environ.get("SERVER_TIMING", "1") == "1"
+
+def format_age(seconds):
+    if seconds < 90:
+        return f"{int(seconds)} seconds"
+    if seconds < 5400:
+        return f"{round(seconds / 60)} minutes"
+    if seconds < 129600:
+        return f"{round(seconds / 3600)} hours"
+    return f"{round(seconds / 86400)} days"
 
 def get_with_ttm(df, num_years):
     if df.empty:
@@ -84,62 +246,68 @@ def get_net_income(info):
             return info[key]
     return None
 
-@app.route('/')
-def home():
-    return render_template_string("""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>Tata Electronics Financial Dashboard</title>
-        <link href="https://fonts.googleapis.com/css2?family=DM+Sans:wght@400;700&display=swap" rel="stylesheet">
-        <style>
-            body { font-family: {{ font_family }}; background: {{ white }}; margin:0; }
-            .main-bg { background: linear-gradient(135deg, {{ deep_blue }} 0%, {{ tata_blue }} 100%);
-                       min-height: 100vh; display:flex; justify-content:center; align-items:center; }
-            .container { background: {{ white }}; padding: 40px; border-radius: 18px;
-                         box-shadow:0 4px 16px rgba(0,0,0,0.08); width: 430px; text-align:center; }
-            h1 { color: {{ tata_blue }}; margin-bottom:18px; }
-            label { display:block; margin:16px 0 4px; font-weight:bold; color: {{ deep_blue }}; }
-            input, button { width:85%; padding:10px; margin:10px 0; border-radius:8px; border:1px solid #d0d9e0; font-size:17px; }
-            button { background: {{ tata_blue }}; color: {{ white }}; font-weight:bold; border:none; cursor:pointer; }
-            button:hover { background: {{ deep_blue }}; }
-            input::placeholder { font-style: italic; color: #555; }
-        </style>
-    </head>
-    <body class="main-bg">
-        <div class="container">
-            <img src="https://www.tataelectronics.com/assets/images/logo.svg" alt="Tata Electronics" style="height:36px;margin-bottom:14px;">
-            <h1>Tata Electronics Financial Dashboard</h1>
-            <form action="/result" method="get">
-                <label>Company Ticker</label>
-                <input type="text" name="ticker" placeholder="Enter Company Ticker Name like AMZN, MSFT" required />
-                <label>Number of Years</label>
-                <input type="number" name="years" min="1" max="10" value="4" required />
-                <button type="submit">View Financials</button>
-            </form>
-        </div>
-    </body>
-    </html>
-    """, font_family=FONT_FAMILY, white=WHITE, deep_blue=DEEP_BLUE, tata_blue=TATA_BLUE)
-
-@app.route('/result')
-def result():
-    ticker = request.args.get('ticker', '').upper().strip()
-    years = int(request.args.get('years', 4))
-    if not ticker:
-        return redirect(url_for('home'))
+@app.context_processor
+def theme():
+    return dict(font_family=FONT_FAMILY, white=WHITE, deep_blue=DEEP_BLUE, tata_blue=TATA_BLUE,
+                chart_layout=CHART_LAYOUT, metrics_sections=metrics_sections, section_titles=SECTION_TITLES,
+                section_slugs=SECTION_SLUGS)
 
-    stock = yf.Ticker(ticker)
-    info = stock.info
+app.add_template_global(format_number)
+app.add_template_global(format_age)
 
-    company_name = info.get('shortName', ticker)
-    currency = info.get('currency', 'N/A')
-    market_cap = info.get('marketCap')
-    total_revenue = info.get('totalRevenue')
-    net_income = get_net_income(info)
+@lru_cache(maxsize=None)
+def home_page():
+    # The landing page has no per-request data, so it is rendered once per process
+    return render_template('home.html').encode('utf-8')
 
-    profile = {
-        "Company Name": company_name,
+@app.route('/')
+def home():
+    return Response(home_page(), mimetype='text/html')
+
+def section_info(section, name):
+    section.update(name=name, title=SECTION_TITLES[name], dataset=DATASET_OF[name], slug=SECTION_SLUGS[name],
+                   lazy=False)
+    return section
+
+def build_section(name, df):
+    return section_info(transform_section(df, metrics_sections[name]), name)
+
+def ratio_section(ticker, data, years):
+    return section_info(derived_section(*cached_derive(ticker, data), years), RATIOS)
+
+def quarterly_section(name, df, years):
+    # The newest years * 4 quarters (capped), oldest first
+    quarters = sorted(c for c in df.columns if hasattr(c, 'year'))[-min(years * 4, QUARTERLY_MAX_PERIODS):]
+    section = transform_section(df.loc[:, quarters], metrics_sections[QUARTERLY_SECTIONS[name]],
+                                quarter_labels(quarters))
+    return section_info(section, name)
+
+def price_section(df, years):
+    return section_info(transform_prices(df, years, PRICE_POINTS), PRICES)
+
+def make_section(ticker, name, data, years):
+    if name == RATIOS:
+        return ratio_section(ticker, data, years)
+    if name == PRICES:
+        return price_section(data[DATASET_OF[name]], years)
+    if name in QUARTERLY_SECTIONS:
+        return quarterly_section(name, data[DATASET_OF[name]], years)
+    return build_section(name, get_with_ttm(data[DATASET_OF[name]], years))
+
+def lazy_section(name):
+    # Placeholder for a section the request did not ask for; the page loads it on expand
+    return {"name": name, "title": SECTION_TITLES[name], "dataset": DATASET_OF[name],
+            "slug": SECTION_SLUGS[name], "lazy": True}
+
+# The info keys the page reads; cached info keeps only these
+INFO_FIELDS = ["shortName", "industry", "sector", "website", "fullTimeEmployees", "address1", "city", "state",
+               "country", "phone", "exchange", "longBusinessSummary", "companyOfficers.name", "companyOfficers.title",
+               "currency", "marketCap", "totalRevenue", "netIncome", "netIncomeToCommon", "netIncomeAvailableToCommon"]
+records.keep(records.INFO, INFO_FIELDS)
+
+def get_profile(ticker, info):
+    return {
+        "Company Name": info.get('shortName', ticker),
         "Industry": info.get("industry", "N/A"),
         "Sector": info.get("sector", "N/A"),
         "Website": info.get("website", "N/A"),
@@ -151,535 +319,556 @@ def result():
         "Phone": info.get("phone", "N/A"),
         "Exchange": info.get("exchange", "N/A")
     }
-    description = info.get('longBusinessSummary', 'N/A')
 
+def get_key_execs(info):
     try:
-        key_execs = info.get("companyOfficers", [])
+        return [{"name": e.get('name', 'N/A'), "title": e.get('title', 'N/A')}
+                for e in info.get("companyOfficers", [])]
     except:
-        key_execs = []
-
-    income_df = get_with_ttm(stock.financials, years)
-    balance_df = get_with_ttm(stock.balance_sheet, years)
-    cashflow_df = get_with_ttm(stock.cashflow, years)
-
-    if income_df.empty and balance_df.empty and cashflow_df.empty:
-        return f"<h2 style='text-align:center;color:{TATA_BLUE}'>No financial data for {ticker}</h2>"
-
-    def to_dict(df, metrics):
-        out = {}
-        for name, key in metrics.items():
-            if key in df.index:
-                row_vals = df.loc[key].where(pd.notnull(df.loc[key]), None).tolist()
-                years_str = [str(c.year) if hasattr(c, "year") else str(c) for c in df.columns]
-                out[name] = dict(zip(years_str, row_vals))
-            else:
-                years_str = [str(c.year) if hasattr(c, "year") else str(c) for c in df.columns]
-                out[name] = {y: None for y in years_str}
-        return out
-
-    income_metrics = to_dict(income_df, metrics_sections['Income Statements'])
-    balance_metrics = to_dict(balance_df, metrics_sections['Balance Sheets'])
-    cashflow_metrics = to_dict(cashflow_df, metrics_sections['Cashflow'])
-
-    def sorted_years(lst):
-        ttm = [y for y in lst if y.upper() == 'TTM']
-        nums = [y for y in lst if y.upper() != 'TTM']
-        nums_sorted = sorted(nums, key=lambda x: int(x))
-        return nums_sorted + ttm
-
-    sorted_income_years = sorted_years(list(next(iter(income_metrics.values())).keys()))
-    sorted_balance_years = sorted_years(list(next(iter(balance_metrics.values())).keys()))
-    sorted_cashflow_years = sorted_years(list(next(iter(cashflow_metrics.values())).keys()))
-
-    def format_dict(d):
-        return {k: {year: format_number(v) for year, v in vals.items()} for k, vals in d.items()}
-
-    income_fmt = format_dict(income_metrics)
-    balance_fmt = format_dict(balance_metrics)
-    cashflow_fmt = format_dict(cashflow_metrics)
-
-    def chart_format(v):
-        if v is None or v == 0:
-            return None
-        try:
-            return round(float(v)/1e6, 2)
-        except:
-            return None
-
-    def chart_data(metrics, key, years):
-        return [chart_format(metrics.get(key, {}).get(y)) for y in years]
-
-    graph_tr = chart_data(income_metrics, 'Total Revenue', sorted_income_years)
-    graph_gp = chart_data(income_metrics, 'Gross Profit', sorted_income_years)
-    graph_opi = chart_data(income_metrics, 'Operating Income', sorted_income_years)
-    graph_ope = chart_data(income_metrics, 'Operating Expense', sorted_income_years)
-    graph_ebt = chart_data(income_metrics, 'EBITDA', sorted_income_years)
-    graph_assets = chart_data(balance_metrics, 'Total Assets', sorted_balance_years)
-    graph_liab = chart_data(balance_metrics, 'Total Liab', sorted_balance_years)
-    graph_long_debt = chart_data(balance_metrics, 'Long Term Debt', sorted_balance_years)
-    graph_net_debt = chart_data(balance_metrics, 'Net Debt', sorted_balance_years)
-    graph_op_cf = chart_data(cashflow_metrics, 'Operating Cash Flow', sorted_cashflow_years)
-    graph_inv_cf = chart_data(cashflow_metrics, 'Investing Cash Flow', sorted_cashflow_years)
-    graph_fin_cf = chart_data(cashflow_metrics, 'Financing Cash Flow', sorted_cashflow_years)
-    graph_repay = chart_data(cashflow_metrics, 'Repayment of Debt', sorted_cashflow_years)
-
-    return render_template_string("""
-<!DOCTYPE html>
-<html>
-<head>
-    <title>{{ profile['Company Name'] }} - Financials</title>
-    <link href="https://fonts.googleapis.com/css2?family=DM+Sans:wght@400;700&display=swap" rel="stylesheet">
-    <script src="https://cdn.jsdelivr.net/npm/chart.js"></script>
-    <script src="https://cdn.jsdelivr.net/npm/chartjs-plugin-datalabels"></script>
-    <style>
-        body {
-            font-family: {{ font_family }};
-            background: {{ white }};
-            margin: 0;
-        }
-        h1 {
-            color: {{ tata_blue }};
-            margin: 15px 0 5px;
-            text-align: center;
-        }
-        .ticker {
-            color: {{ deep_blue }};
-            text-align: center;
-            margin-bottom: 20px;
-            font-size: 1.2em;
-            font-weight: 500;
-        }
-        .container-flex {
-            max-width: 900px;
-            margin: 0 auto 30px auto;
-            display: flex;
-            gap: 20px;
-            padding: 0 15px;
-            flex-wrap: wrap;
-        }
-        .profile-section {
-            flex: 2 1 500px;
-            background: {{ white }};
-            border-radius: 12px;
-            box-shadow: 0 2px 8px rgba(0,0,0,0.08);
-            padding: 20px;
-            text-align: left;
-            font-size: 0.95rem;
-            line-height: 1.6;
-        }
-        .financial-data {
-            flex: 1 1 300px;
-            background: {{ white }};
-            border-radius: 12px;
-            box-shadow: 0 2px 8px rgba(0,0,0,0.08);
-            padding: 20px;
-            font-size: 0.95rem;
-            color: {{ deep_blue }};
-        }
-        .financial-data strong {
-            display: block;
-            padding: 4px 0;
-        }
-        .description-section {
-            max-width: 900px;
-            margin: 0 auto 30px auto;
-            padding: 0 15px;
-        }
-        .desc-title {
-            color: {{ tata_blue }};
-            font-weight: 700;
-            font-size: 1.4rem;
-            margin-bottom: 10px;
-            text-align: left;
-        }
-        .desc-text {
-            text-align: justify;
-            font-size: 1em;
-            color: {{ deep_blue }};
-            line-height: 1.5;
-        }
-        .key-personalities {
-            max-width: 900px;
-            margin: 0 auto 30px auto;
-            padding: 0 15px;
-        }
-        .key-personalities h2 {
-            color: {{ tata_blue }};
-            font-weight: 700;
-            font-size: 1.4rem;
-            margin-bottom: 10px;
-            text-align: left;
-        }
-        .key-list {
-            list-style-type: none;
-            padding-left: 0;
-            color: {{ deep_blue }};
-            font-size: 1rem;
-            line-height: 1.6;
-        }
-        .key-list li {
-            margin-bottom: 6px;
-        }
-        table {
-            width: 100%;
-            max-width: 900px;
-            margin: 0 auto 20px;
-            border-collapse: collapse;
-            font-variant-numeric: tabular-nums;
-        }
-        th, td {
-            border: 1px solid #ddd;
-            padding: 6px 8px;
-            text-align: center;
-        }
-        th {
-            background: {{ tata_blue }};
-            color: {{ white }};
-            font-weight: 600;
-            font-size: 0.95rem;
-        }
-        .charts-row {
-            max-width: 900px;
-            margin: 20px auto;
-            display: flex;
-            flex-wrap: wrap;
-            gap: 20px;
-            padding: 0 15px;
-        }
-        .chart-box {
-            flex: 1 1 45%;
-            background: #f8faff;
-            border-radius: 12px;
-            box-shadow: 0 2px 8px rgba(0,0,0,0.08);
-            padding: 20px;
-        }
-        .chart-title {
-            font-weight: 700;
-            margin-bottom: 12px;
-            color: {{ tata_blue }};
-            text-align: center;
-            font-size: 1.1rem;
-        }
-        canvas {
-            border-radius: 12px;
-            background: white;
-            height: 380px !important;
-            width: 100% !important;
-        }
-    </style>
-</head>
-<body>
-    <h1>{{ profile['Company Name'] }}</h1>
-    <div class="ticker">({{ ticker }})</div>
-
-    <div class="container-flex">
-        <div class="profile-section">
-            <h2>Company Profile</h2>
-            <strong>Industry:</strong> {{ profile['Industry'] }}<br>
-            <strong>Sector:</strong> {{ profile['Sector'] }}<br>
-            <strong>Full Time Employees:</strong> {{ profile['Full Time Employees'] }}<br>
-            <strong>Website:</strong> <a href="{{ profile['Website'] }}" target="_blank">{{ profile['Website'] }}</a><br>
-            <strong>Headquarters:</strong> {{ profile['Headquarters'] }}<br>
-            <strong>City:</strong> {{ profile['City'] }}<br>
-            <strong>State:</strong> {{ profile['State'] }}<br>
-            <strong>Country:</strong> {{ profile['Country'] }}<br>
-            <strong>Phone:</strong> {{ profile['Phone'] }}<br>
-            <strong>Exchange:</strong> {{ profile['Exchange'] }}
-        </div>
-        <div class="financial-data">
-            <h2>Financial Data Summary</h2>
-            <strong>Currency:</strong> {{ currency }}<br>
-            <strong>Market Cap:</strong> {{ format_number(market_cap) }}<br>
-            <strong>Total Revenue:</strong> {{ format_number(total_revenue) }}<br>
-            <strong>Net Income:</strong> {{ format_number(net_income) }}
-        </div>
-    </div>
-
-    <div class="description-section">
-        <h2 class="desc-title">Description</h2>
-        <p class="desc-text">{{ description }}</p>
-    </div>
-
-    <div class="key-personalities">
-        <h2>Key Personalities</h2>
-        {% if key_execs and key_execs|length > 0 %}
-        <ul class="key-list">
-            {% for exec in key_execs %}
-            <li><strong>{{ exec.get('name', 'N/A') }}</strong> — {{ exec.get('title', 'N/A') }}</li>
-            {% endfor %}
-        </ul>
-        {% else %}
-        <p style="color: {{ deep_blue }}">No key executive data available.</p>
-        {% endif %}
-    </div>
-
-    <div class="section">
-        <h2>Income Statement</h2>
-        <table>
-            <thead>
-                <tr>
-                    <th>Metric</th>
-                    {% for y in sorted_income_years %}
-                    <th>{{ y }}</th>
-                    {% endfor %}
-                </tr>
-            </thead>
-            <tbody>
-                {% for m, vals in income_fmt.items() %}
-                <tr>
-                    <td>{{ m }}</td>
-                    {% for y in sorted_income_years %}
-                    <td>{{ vals[y] }}</td>
-                    {% endfor %}
-                </tr>
-                {% endfor %}
-            </tbody>
-        </table>
-        <!-- Income Statement Charts with exact layout -->
-        <div class="charts-row">
-            <div class="chart-box">
-                <div class="chart-title">Total Revenue vs Gross Profit</div>
-                <canvas id="chart1"></canvas>
-            </div>
-            <div class="chart-box">
-                <div class="chart-title">Operating Income vs Operating Expense</div>
-                <canvas id="chart2"></canvas>
-            </div>
-        </div>
-        <div class="charts-row">
-            <div class="chart-box">
-                <div class="chart-title">Total Revenue vs EBITDA</div>
-                <canvas id="chart3"></canvas>
-            </div>
-        </div>
-    </div>
-
-    <div class="section">
-        <h2>Balance Sheet</h2>
-        <table>
-            <thead>
-                <tr>
-                    <th>Metric</th>
-                    {% for y in sorted_balance_years %}
-                    <th>{{ y }}</th>
-                    {% endfor %}
-                </tr>
-            </thead>
-            <tbody>
-                {% for m, vals in balance_fmt.items() %}
-                <tr>
-                    <td>{{ m }}</td>
-                    {% for y in sorted_balance_years %}
-                    <td>{{ vals[y] }}</td>
-                    {% endfor %}
-                </tr>
-                {% endfor %}
-            </tbody>
-        </table>
-        <div class="charts-row">
-            <div class="chart-box">
-                <div class="chart-title">Total Assets vs Total Liabilities</div>
-                <canvas id="chart5"></canvas>
-            </div>
-            <div class="chart-box">
-                <div class="chart-title">Long Term Debt vs Net Debt</div>
-                <canvas id="chart6"></canvas>
-            </div>
-        </div>
-    </div>
-
-    <div class="section">
-        <h2>Cash Flow</h2>
-        <table>
-            <thead>
-                <tr>
-                    <th>Metric</th>
-                    {% for y in sorted_cashflow_years %}
-                    <th>{{ y }}</th>
-                    {% endfor %}
-                </tr>
-            </thead>
-            <tbody>
-                {% for m, vals in cashflow_fmt.items() %}
-                <tr>
-                    <td>{{ m }}</td>
-                    {% for y in sorted_cashflow_years %}
-                    <td>{{ vals[y] }}</td>
-                    {% endfor %}
-                </tr>
-                {% endfor %}
-            </tbody>
-        </table>
-        <div class="charts-row">
-            <div class="chart-box">
-                <div class="chart-title">Operating vs Investing vs Financing Cash Flow</div>
-                <canvas id="chart7"></canvas>
-            </div>
-            <div class="chart-box">
-                <div class="chart-title">Repayment of Debt</div>
-                <canvas id="chart8"></canvas>
-            </div>
-        </div>
-    </div>
-
-<script>
-    const labelsIncome = {{ sorted_income_years | tojson }};
-    const labelsBalance = {{ sorted_balance_years | tojson }};
-    const labelsCash = {{ sorted_cashflow_years | tojson }};
-    const commonOptions = {
-        responsive: true,
-        plugins: { legend: { position: 'bottom' }, datalabels: { display: false } },
-        elements: { point: { radius: 0 } },
-        scales: {
-            x: { ticks: { font: { size: 10 } } },
-            y: { ticks: { font: { size: 10 } } }
-        }
-    };
-
-    new Chart(document.getElementById('chart1'), {
-        type: 'line',
-        data: {
-            labels: labelsIncome,
-            datasets: [
-                { label: 'Total Revenue (Mn)', data: {{ graph_tr | tojson }}, borderColor: '{{ tata_blue }}', fill: false },
-                { label: 'Gross Profit (Mn)', data: {{ graph_gp | tojson }}, borderColor: '{{ deep_blue }}', fill: false }
-            ]
-        },
-        options: commonOptions,
-        plugins: [ChartDataLabels]
-    });
-
-    new Chart(document.getElementById('chart2'), {
-        type: 'line',
-        data: {
-            labels: labelsIncome,
-            datasets: [
-                { label: 'Operating Income (Mn)', data: {{ graph_opi | tojson }}, borderColor: 'purple', fill: false },
-                { label: 'Operating Expense (Mn)', data: {{ graph_ope | tojson }}, borderColor: 'orange', fill: false }
-            ]
-        },
-        options: commonOptions,
-        plugins: [ChartDataLabels]
-    });
-
-    new Chart(document.getElementById('chart3'), {
-        type: 'line',
-        data: {
-            labels: labelsIncome,
-            datasets: [
-                { label: 'Total Revenue (Mn)', data: {{ graph_tr | tojson }}, borderColor: '{{ tata_blue }}', fill: false },
-                { label: 'EBITDA (Mn)', data: {{ graph_ebt | tojson }}, borderColor: 'red', fill: false }
-            ]
-        },
-        options: commonOptions,
-        plugins: [ChartDataLabels]
-    });
-
-    new Chart(document.getElementById('chart5'), {
-        type: 'bar',
-        data: {
-            labels: labelsBalance,
-            datasets: [
-                { label: 'Total Assets (Mn)', data: {{ graph_assets | tojson }}, backgroundColor: '{{ tata_blue }}' },
-                { label: 'Total Liabilities (Mn)', data: {{ graph_liab | tojson }}, backgroundColor: '{{ deep_blue }}' }
-            ]
-        },
-        options: {
-            responsive: true,
-            plugins: {
-                legend: { position: 'bottom', labels: { font: { size: 10 } } },
-                datalabels: {
-                    display: true,
-                    font: { size: 10 },
-                    color: '{{ deep_blue }}',
-                    anchor: 'end',
-                    align: 'center',
-                    formatter: val => val !== null ? val : ''
-                }
-            },
-            scales: {
-                x: { ticks: { font: { size: 10 } } },
-                y: { ticks: { font: { size: 10 } } }
+        return []
+
+def report_header(ticker, years, info, errors, stale):
+    # Everything on the page above the statement sections
+    return {
+        "ticker": ticker,
+        "years": years,
+        "profile": get_profile(ticker, info),
+        "description": info.get('longBusinessSummary', 'N/A'),
+        "key_execs": get_key_execs(info),
+        "currency": info.get('currency', 'N/A'),
+        "market_cap": info.get('marketCap'),
+        "total_revenue": info.get('totalRevenue'),
+        "net_income": get_net_income(info),
+        "errors": errors,
+        "stale": stale,
+    }
+
+def build_report(ticker, years, data, errors, stale=None, sections=DEFAULT_SECTIONS):
+    # Only the requested sections are transformed; the rest become lazy placeholders
+    if all(data[dataset].empty for dataset in section_datasets(sections)[1:]):
+        return None
+    report = report_header(ticker, years, data['info'], errors, stale or {})
+    report["sections"] = [make_section(ticker, name, data, years) if name in sections else lazy_section(name)
+                          for name in SECTIONS]
+    report["lazy_sections"] = len(sections) < len(SECTIONS)
+    return report
+
+def section_datasets(sections):
+    # Upstream datasets a set of sections needs; the ratios need every statement
+    datasets = ["info"]
+    for name in sections:
+        needed = SECTION_DATASETS.values() if name == RATIOS else [DATASET_OF[name]]
+        datasets += [dataset for dataset in needed if dataset not in datasets]
+    return tuple(datasets)
+
+class ReportStream:
+    """One ticker's datasets consumed in arrival order, for the streamed result page.
+
+    The page head can go out once info is in and a statement with rows has
+    arrived (or every statement has, so a ticker without data still gets the
+    plain not-found answer). Iterating yields the sections in page order,
+    each as soon as its statement is in; built sections are kept because the
+    template loops over them twice (tables, then chart scripts).
+    """
+
+    def __init__(self, ticker, years, sections, timer):
+        self.ticker = ticker
+        self.years = years
+        self.selected = sections
+        self.timer = timer
+        self.data, self.errors, self.stale = {}, {}, {}
+        self.timings = {}
+        self.completions = iter_dataset_results([(ticker, dataset) for dataset in section_datasets(sections)],
+                                                timings=self.timings)
+        self.sections = []
+
+    def receive(self):
+        _, dataset, value, error, age = next(self.completions)
+        self.data[dataset] = value
+        if error is not None:
+            self.errors[dataset] = error
+        if age is not None:
+            self.stale[dataset] = age
+        if (self.ticker, dataset) in self.timings:
+            self.timer.record(dataset, self.timings.pop((self.ticker, dataset)),
+                              'stale' if age is not None else 'error' if error is not None else None)
+
+    def wait_for_head(self):
+        # True once the page head can be sent, False if the ticker has no statements at all
+        statements = section_datasets(self.selected)[1:]
+        while True:
+            has_rows = any(not self.data[d].empty for d in statements if d in self.data)
+            if 'info' in self.data and (has_rows or all(d in self.data for d in statements)):
+                return has_rows
+            self.receive()
+
+    def context(self):
+        report = report_header(self.ticker, self.years, self.data['info'], self.errors, self.stale)
+        report["sections"] = self
+        report["lazy_sections"] = len(self.selected) < len(SECTIONS)
+        return report
+
+    def build(self, name):
+        if name not in self.selected:
+            return lazy_section(name)
+        needed = section_datasets([name])[1:]
+        while not all(dataset in self.data for dataset in needed):
+            self.receive()
+        with self.timer.stage('transform'):
+            return make_section(self.ticker, name, self.data, self.years)
+
+    def __iter__(self):
+        for index, name in enumerate(SECTIONS):
+            if index == len(self.sections):
+                self.sections.append(self.build(name))
+            yield self.sections[index]
+
+def report_payload(report):
+    # Compact JSON form: per-metric arrays aligned with each section's years
+    summary = {k: report[k] for k in ("currency", "market_cap", "total_revenue", "net_income")}
+    summary["formatted"] = {k: format_number(report[k]) for k in ("market_cap", "total_revenue", "net_income")}
+    return {
+        "ticker": report["ticker"],
+        "years": report["years"],
+        "profile": report["profile"],
+        "description": report["description"],
+        "key_execs": report["key_execs"],
+        "summary": summary,
+        "sections": {
+            section["name"]: {
+                "title": section["title"],
+                "dataset": section["dataset"],
+                "years": section["years"],
+                "labels": section.get("labels", section["years"]),
+                "raw": section["raw"],
+                "formatted": section["formatted"],
+                "charts": section["charts"],
             }
+            for section in report["sections"] if not section["lazy"]
         },
-        plugins: [ChartDataLabels]
-    });
-
-    new Chart(document.getElementById('chart6'), {
-        type: 'line',
-        data: {
-            labels: labelsBalance,
-            datasets: [
-                { label: 'Long Term Debt (Mn)', data: {{ graph_long_debt | tojson }}, borderColor: 'orange', fill: false },
-                { label: 'Net Debt (Mn)', data: {{ graph_net_debt | tojson }}, borderColor: 'brown', fill: false }
-            ]
-        },
-        options: commonOptions,
-        plugins: [ChartDataLabels]
-    });
-
-    new Chart(document.getElementById('chart7'), {
-        type: 'line',
-        data: {
-            labels: labelsCash,
-            datasets: [
-                { label: 'Operating CF (Mn)', data: {{ graph_op_cf | tojson }}, borderColor: 'green', fill: false },
-                { label: 'Investing CF (Mn)', data: {{ graph_inv_cf | tojson }}, borderColor: '{{ tata_blue }}', fill: false },
-                { label: 'Financing CF (Mn)', data: {{ graph_fin_cf | tojson }}, borderColor: '{{ deep_blue }}', fill: false }
-            ]
-        },
-        options: commonOptions,
-        plugins: [ChartDataLabels]
-    });
-
-    new Chart(document.getElementById('chart8'), {
-        type: 'line',
-        data: {
-            labels: labelsCash,
-            datasets: [
-                { label: 'Repayment of Debt (Mn)', data: {{ graph_repay | tojson }}, borderColor: 'red', fill: false }
-            ]
+        "errors": report["errors"],
+        "stale": report["stale"],
+    }
+
+def get_years(default=4):
+    try:
+        return min(max(1, int(request.values.get('years', default))), MAX_YEARS)
+    except ValueError:
+        return default
+
+def get_sections():
+    # Sections named in ?sections=, in page order; the default sections when absent
+    requested = {value.strip().lower() for value in request.values.get('sections', '').split(',')}
+    sections = [name for name in SECTIONS if SECTION_SLUGS[name] in requested or DATASET_OF[name] in requested]
+    return sections or DEFAULT_SECTIONS
+
+def get_tickers():
+    # Comma or whitespace separated, from the query string or a posted form, without repeats
+    tickers = []
+    for ticker in re.split(r'[\s,]+', request.values.get('tickers', '')):
+        ticker = ticker.upper().strip()
+        if ticker and ticker not in tickers:
+            tickers.append(ticker)
+    return tickers
+
+@app.before_request
+def start_timer():
+    g.timer = metrics.StageTimer()
+
+@app.after_request
+def record_timing(response):
+    timer = g.get('timer')
+    if timer is not None:
+        endpoint = request.endpoint or 'unmatched'
+        metrics.request_seconds.observe(time.perf_counter() - timer.start, endpoint=endpoint)
+        metrics.requests_total.inc(endpoint=endpoint, status=response.status_code)
+        if SERVER_TIMING:
+            response.headers['Server-Timing'] = timer.header()
+    return response
+
+page_cache = TTLCache(max_entries=PAGE_CACHE_ENTRIES)
+
+@lru_cache(maxsize=None)
+def render_version():
+    # Changes with the templates and the code that lays out the page, so a
+    # deploy never validates a copy rendered by the previous one
+    digest = hashlib.blake2b(digest_size=8)
+    for name in sorted(app.jinja_env.list_templates()):
+        digest.update(app.jinja_env.loader.get_source(app.jinja_env, name)[0].encode())
+    for name in ('app.py', 'transform.py', 'derived.py'):
+        with open(os.path.join(app.root_path, name), 'rb') as source:
+            digest.update(source.read())
+    return digest.hexdigest()
+
+def page_validators(ticker, years, sections, data):
+    # ETag from the page code, the request and the content of every dataset on
+    # the page; Last-Modified from when they were cached. The page is good
+    # until the first of its datasets expires.
+    datasets = section_datasets(sections)
+    digest = hashlib.blake2b(f"{render_version()}:{ticker}:{years}:{','.join(sections)}".encode(), digest_size=16)
+    for dataset in datasets:
+        digest.update(records.digest(data[dataset]))
+    stored = [at for at in (cached_at(ticker, dataset) for dataset in datasets) if at is not None]
+    remaining = [ttl_remaining(ticker, dataset) or 0 for dataset in datasets]
+    return {"etag": digest.hexdigest(), "last_modified": int(max(stored, default=time.time())),
+            "max_age": int(min(remaining + [PAGE_TTL]))}
+
+def assemble_report(ticker, years, sections, fetched, timings):
+    # Upstream waits (cache misses only) and the pandas transform as separate stages
+    data, errors, stale = fetched
+    for dataset, seconds in timings.items():
+        g.timer.record(dataset, seconds, 'stale' if dataset in stale else 'error' if dataset in errors else None)
+    with g.timer.stage('transform'):
+        report = build_report(ticker, years, data, errors, stale, sections)
+    if report is not None and not errors and not stale:
+        report["validators"] = page_validators(ticker, years, sections, data)
+    return report, errors
+
+def fetch_report(ticker, years, sections):
+    timings = {}
+    with g.timer.stage('fetch'):
+        fetched = get_datasets(ticker, section_datasets(sections), timings=timings)
+    return assemble_report(ticker, years, sections, fetched, timings)
+
+def no_data_page(ticker):
+    return f"<h2 style='text-align:center;color:{TATA_BLUE}'>No financial data for {ticker}</h2>"
+
+def upstream_failed(errors):
+    # No statement rows because fetches failed (error, timeout, open circuit)
+    # with no last good copy, rather than because the ticker has none
+    return any(dataset != 'info' for dataset in errors)
+
+def unavailable_page(ticker):
+    page = (f"<h2 style='text-align:center;color:{TATA_BLUE}'>Financial data for {escape(ticker)} is "
+            f"temporarily unavailable</h2><p style='text-align:center'>The data source is not responding. "
+            f"Please try again shortly.</p>")
+    return page, 503, {'Retry-After': str(retry_after())}
+
+def no_result(ticker, errors):
+    return unavailable_page(ticker) if upstream_failed(errors) else no_data_page(ticker)
+
+def unknown_result(ticker):
+    # Turned away before any upstream call, with the symbols it might have meant
+    links = ", ".join(f"<a href='{url_for('result', ticker=match['ticker'], years=get_years())}'>"
+                      f"{escape(match['ticker'])}</a>" for match in symbols.near(ticker))
+    page = f"<h2 style='text-align:center;color:{TATA_BLUE}'>Unknown ticker {escape(ticker)}</h2>"
+    if links:
+        page += f"<p style='text-align:center'>Did you mean {links}?</p>"
+    return page, 404
+
+def unknown_financials(ticker):
+    return jsonify({"ticker": ticker, "error": f"Unknown ticker {ticker}", "suggestions": symbols.near(ticker)}), 404
+
+def stream_result(ticker, years, sections, key):
+    report = ReportStream(ticker, years, sections, g.timer)
+    with g.timer.stage('fetch'):
+        found = report.wait_for_head()
+    if not found:
+        return no_result(ticker, report.errors)
+    timer = g.timer
+    chunks = stream_template('result.html', **report.context())
+
+    def generate():
+        start = time.perf_counter()
+        page = []
+        for chunk in chunks:
+            page.append(chunk)
+            yield chunk
+        timer.record('stream', time.perf_counter() - start)
+        if not report.errors and not report.stale:
+            store_page(key, ''.join(page), page_validators(ticker, years, sections, report.data))
+
+    return Response(generate(), mimetype='text/html')
+
+def result_key(ticker, years, sections):
+    key = f"page:result:{ticker}:{years}"
+    if sections != DEFAULT_SECTIONS:
+        key += ":" + ",".join(SECTION_SLUGS[name] for name in sections)
+    return key
+
+def store_page(key, html, validators):
+    # Kept compressed, once per encoding, in this worker and the shared cache
+    body = html.encode('utf-8')
+    bodies = {'gzip': gzip.compress(body, PAGE_GZIP_LEVEL, mtime=0)}
+    if brotli is not None:
+        bodies['br'] = brotli.compress(body, quality=PAGE_BROTLI_QUALITY)
+    entry = {'validators': validators, 'bodies': bodies}
+    if validators['max_age'] > 0:
+        page_cache.set(key, entry, validators['max_age'])
+        if shared_cache is not None:
+            shared_cache.set(key, entry, validators['max_age'])
+    return entry
+
+def cached_page(key):
+    # (entry, seconds left) from this worker's pages, then the shared cache
+    entry = page_cache.get(key)
+    if entry is not None:
+        return entry, page_cache.ttl_remaining(key)
+    hit = shared_cache.get(key) if shared_cache is not None else None
+    if hit is None or not isinstance(hit[0], dict):
+        return None, 0
+    entry, expires_at = hit
+    page_cache.set(key, entry, expires_at - time.time())
+    return entry, expires_at - time.time()
+
+def not_modified(validators):
+    # The client's copy (If-None-Match, else If-Modified-Since) is still current
+    return not is_resource_modified(request.environ, etag=validators['etag'],
+                                    last_modified=datetime.fromtimestamp(validators['last_modified'], timezone.utc))
+
+def validated(response, validators, max_age):
+    response.set_etag(validators['etag'])
+    response.last_modified = validators['last_modified']
+    response.cache_control.public = True
+    response.cache_control.max_age = max(0, int(max_age))
+    response.vary.add('Accept-Encoding')
+    return response
+
+def page_response(entry, max_age):
+    validators = entry['validators']
+    if not_modified(validators):
+        return validated(Response(status=304), validators, max_age)
+    encoding = request.accept_encodings.best_match([name for name in ('br', 'gzip') if name in entry['bodies']],
+                                                   default='identity')
+    if encoding == 'identity':
+        response = Response(gzip.decompress(entry['bodies']['gzip']), mimetype='text/html')
+    else:
+        response = Response(entry['bodies'][encoding], mimetype='text/html')
+        response.content_encoding = encoding
+    return validated(response, validators, max_age)
+
+def cached_result(key):
+    # Fully rendered pages are cached per worker and shared; degraded ones are not cached
+    with g.timer.stage('page_cache'):
+        entry, remaining = cached_page(key)
+    metrics.page_cache_total.inc(result='hit' if entry is not None else 'miss')
+    return page_response(entry, remaining) if entry is not None else None
+
+def unchanged_result(ticker, years, sections):
+    # A conditional request answered from the cached datasets alone, without
+    # rendering, when the page they make is the one the client already has
+    if 'If-None-Match' not in request.headers and 'If-Modified-Since' not in request.headers:
+        return None
+    data = {dataset: lookup(ticker, dataset) for dataset in section_datasets(sections)}
+    if any(value is None for value in data.values()):
+        return None
+    validators = page_validators(ticker, years, sections, data)
+    if not not_modified(validators):
+        return None
+    return validated(Response(status=304), validators, validators['max_age'])
+
+def render_result(ticker, report, errors, key):
+    if report is None:
+        return no_result(ticker, errors)
+    with g.timer.stage('render'):
+        html = render_template('result.html', **report)
+    validators = report.get('validators')
+    if validators is None:
+        return html
+    return page_response(store_page(key, html, validators), validators['max_age'])
+
+@app.route('/result')
+def result():
+    ticker = request.args.get('ticker', '').upper().strip()
+    years = get_years()
+    sections = get_sections()
+    if not ticker:
+        return redirect(url_for('home'))
+    if not symbols.accepted(ticker):
+        return unknown_result(ticker)
+    key = result_key(ticker, years, sections)
+    cached = cached_result(key) or unchanged_result(ticker, years, sections)
+    if cached is not None:
+        return cached
+    if STREAM_RESULT:
+        return stream_result(ticker, years, sections, key)
+    return render_result(ticker, *fetch_report(ticker, years, sections), key)
+
+def financials_response(ticker, report, errors):
+    if report is None and upstream_failed(errors):
+        return jsonify({"ticker": ticker, "error": "The financial data source is unavailable, try again shortly",
+                        "errors": errors}), 503, {'Retry-After': str(retry_after())}
+    if report is None:
+        return jsonify({"ticker": ticker, "error": f"No financial data for {ticker}", "errors": errors}), 404
+    with g.timer.stage('serialize'):
+        response = jsonify(report_payload(report))
+    response.cache_control.public = True
+    response.cache_control.max_age = API_MAX_AGE if not report['stale'] else 0
+    return response
+
+@app.route('/api/financials/<ticker>')
+def api_financials(ticker):
+    ticker = ticker.upper().strip()
+    if not symbols.accepted(ticker):
+        return unknown_financials(ticker)
+    return financials_response(ticker, *fetch_report(ticker, get_years(), get_sections()))
+
+@app.route('/api/suggest')
+def suggest():
+    # Ticker and company-name prefix matches for the home form, from memory only
+    response = jsonify({"query": request.args.get('q', ''),
+                        "suggestions": symbols.suggest(request.args.get('q', ''))})
+    response.cache_control.public = True
+    response.cache_control.max_age = API_MAX_AGE
+    return response
+
+def compare_entry(ticker, years, data, errors, stale, sections):
+    report = build_report(ticker, years, data, errors, stale, sections)
+    if report is None:
+        return {"ticker": ticker, "error": f"No financial data for {ticker}"}
+    return {
+        "ticker": ticker,
+        "name": report["profile"]["Company Name"],
+        "sections": {
+            section["name"]: {
+                "years": section["years"],
+                "formatted": section["formatted"],
+                "charts": section["charts"],
+            }
+            for section in report["sections"] if not section["lazy"]
         },
-        options: commonOptions,
-        plugins: [ChartDataLabels]
-    });
-</script>
-</body>
-</html>
-""",
-    profile=profile,
-    ticker=ticker,
-    description=description,
-    key_execs=key_execs,
-    currency=currency,
-    market_cap=market_cap,
-    total_revenue=total_revenue,
-    net_income=net_income,
-    income_fmt=income_fmt,
-    balance_fmt=balance_fmt,
-    cashflow_fmt=cashflow_fmt,
-    sorted_income_years=sorted_income_years,
-    sorted_balance_years=sorted_balance_years,
-    sorted_cashflow_years=sorted_cashflow_years,
-    graph_tr=graph_tr,
-    graph_gp=graph_gp,
-    graph_opi=graph_opi,
-    graph_ope=graph_ope,
-    graph_ebt=graph_ebt,
-    graph_assets=graph_assets,
-    graph_liab=graph_liab,
-    graph_long_debt=graph_long_debt,
-    graph_net_debt=graph_net_debt,
-    graph_op_cf=graph_op_cf,
-    graph_inv_cf=graph_inv_cf,
-    graph_fin_cf=graph_fin_cf,
-    graph_repay=graph_repay,
-    tata_blue=TATA_BLUE,
-    deep_blue=DEEP_BLUE,
-    white=WHITE,
-    font_family=FONT_FAMILY,
-    format_number=format_number
-)
+    }
+
+@app.route('/compare')
+def compare():
+    tickers = get_tickers()
+    if not tickers:
+        return redirect(url_for('home'))
+    if len(tickers) > COMPARE_MAX_TICKERS:
+        return Response(f"Compare at most {COMPARE_MAX_TICKERS} tickers at a time ({len(tickers)} given)",
+                        status=400, mimetype='text/plain')
+    # Unknown symbols never go upstream
+    tickers, rejected = symbols.split_accepted(tickers)
+    years = get_years()
+    sections = [name for name in get_sections() if name in COMPARE_METRICS] or DEFAULT_SECTIONS
+    # Tickers are fetched in parallel and each one is flushed to the browser
+    # as soon as its data is in, instead of waiting for the slowest
+    entries = (compare_entry(ticker, years, data, errors, stale, sections)
+               for ticker, data, errors, stale in iter_datasets(tickers, section_datasets(sections),
+                                                                 timeout=COMPARE_TIMEOUT))
+    return Response(stream_template('compare.html', tickers=tickers, rejected=rejected, years=years,
+                                    sections=sections, section_metrics=COMPARE_METRICS, metric_units=METRIC_UNITS,
+                                    entries=entries), mimetype='text/html')
+
+@lru_cache(maxsize=None)
+def shell_page():
+    return render_template('shell.html').encode('utf-8')
+
+@app.route('/view')
+def view():
+    # Static shell: identical bytes for every ticker, the data comes from /api/financials
+    response = Response(shell_page(), mimetype='text/html')
+    response.cache_control.public = True
+    response.cache_control.max_age = SHELL_MAX_AGE
+    return response
+
+def export_rows(ticker, data, years, sections):
+    # One ticker's statements as export columns, metric by metric, oldest period first
+    columns = {name: [] for name in export.COLUMNS}
+    for name in sections:
+        df = get_with_ttm(data[SECTION_DATASETS[name]], years)
+        if df.empty:
+            continue
+        labels, values = extract_metrics(df, metrics_sections[name])
+        columns["ticker"] += [ticker] * values.size
+        columns["section"] += [name] * values.size
+        columns["metric"] += [metric for metric in metrics_sections[name] for _ in labels]
+        columns["period"] += labels * len(metrics_sections[name])
+        columns["value"] += [None if pd.isna(v) else v for v in values.ravel().tolist()]
+    return columns
+
+@app.route('/api/export', methods=['GET', 'POST'])
+def export_data():
+    # Long-format statement metrics for many tickers; POST the ticker list when it is too long for a URL
+    fmt = request.values.get('format', 'csv').lower()
+    if fmt not in export.FORMATS:
+        return jsonify({"error": f"Unknown format {fmt!r}", "formats": list(export.FORMATS)}), 400
+    if not export.available(fmt):
+        return jsonify({"error": f"{fmt} export needs pyarrow installed"}), 400
+    tickers = get_tickers()
+    if len(tickers) > export.EXPORT_MAX_TICKERS:
+        return jsonify({"error": f"Export at most {export.EXPORT_MAX_TICKERS} tickers per request",
+                        "given": len(tickers), "max": export.EXPORT_MAX_TICKERS}), 400
+    tickers, rejected = symbols.split_accepted(tickers)
+    if rejected and not tickers:
+        return jsonify({"error": "Unknown tickers", "rejected": rejected}), 400
+    if not tickers:
+        return jsonify({"error": "Pass tickers, e.g. ?tickers=AAPL,MSFT"}), 400
+    years = get_years()
+    sections = [name for name in get_sections() if name in metrics_sections] or list(metrics_sections)
+    datasets = [SECTION_DATASETS[name] for name in sections]
+    batches = export.iter_batches(tickers, datasets, lambda ticker, data: export_rows(ticker, data, years, sections))
+    response = Response(stream_with_context(export.stream(fmt, batches)), mimetype=export.FORMATS[fmt])
+    extension = "arrows" if fmt == "arrow" else fmt
+    response.headers['Content-Disposition'] = f'attachment; filename="fundamentals.{extension}"'
+    if rejected:
+        # The body streams before anything else could be said, so the skipped symbols go in a header
+        response.headers['X-Rejected-Tickers'] = ",".join(rejected)
+    return response
+
+@app.route('/api/screen')
+def screen():
+    # ?filter=revenue_growth > 20 and net_debt_to_ebitda < 1&sort=-revenue_growth&page=2
+    fields = [f.strip() for f in request.args.get('fields', '').split(',') if f.strip()] or screener.DEFAULT_FIELDS
+    try:
+        page = max(1, int(request.args.get('page', 1)))
+        per_page = min(screener.SCREENER_MAX_PAGE, max(1, int(request.args.get('per_page', 50))))
+    except ValueError:
+        return jsonify({"error": "page and per_page must be whole numbers"}), 400
+    try:
+        with g.timer.stage('screen'):
+            result = screener.screener.screen(request.args.get('filter', ''), request.args.get('sort', ''),
+                                              fields, page, per_page)
+    except screener.ScreenError as exc:
+        return jsonify({"error": str(exc), "fields": screener.FIELDS}), 400
+    result["panel"] = screener.screener.stats()
+    return jsonify(result)
+
+@app.route('/cache/stats')
+def cache_status():
+    return jsonify(dict(cache_stats(), pages=page_cache.stats(), symbols=symbols.current().stats()))
+
+def cache_metrics():
+    stats = cache_stats()
+    caches = [("memory", stats)] + ([("shared", stats["shared"])] if "shared" in stats else [])
+    breaker = stats["breaker"]
+    yield from metrics.family("dashboard_cache_hits_total", "Cache hits per cache.",
+                              [({"cache": name}, s["hits"]) for name, s in caches], "counter")
+    yield from metrics.family("dashboard_cache_misses_total", "Cache misses per cache.",
+                              [({"cache": name}, s["misses"]) for name, s in caches], "counter")
+    yield from metrics.family("dashboard_cache_hit_ratio", "Cache hit ratio since start, per cache.",
+                              [({"cache": name}, s["hit_ratio"]) for name, s in caches])
+    yield from metrics.family("dashboard_cache_bytes", "Approximate bytes held by the in-process cache.",
+                              [({}, stats["bytes"])])
+    yield from metrics.family("dashboard_cache_bytes_per_ticker", "Approximate in-process cache bytes per ticker.",
+                              [({}, stats["bytes_per_ticker"])])
+    yield from metrics.family("dashboard_singleflight_coalesced_total", "Fetches that joined one already in flight.",
+                              [({}, stats["singleflight"]["coalesced"])], "counter")
+    yield from metrics.family("dashboard_breaker_open", "1 while the upstream circuit is not closed.",
+                              [({"upstream": breaker["name"]}, int(breaker["state"] != "closed"))])
+    yield from metrics.family("dashboard_breaker_rejected_total", "Calls rejected by the open circuit.",
+                              [({"upstream": breaker["name"]}, breaker["rejected"])], "counter")
+    provider = stats["provider"].get("upstream", stats["provider"])
+    if "http" in provider:
+        http = provider["http"]
+        yield from metrics.family("dashboard_upstream_http_requests_total", "Upstream HTTP requests by connection.",
+                                  [({"connection": "reused"}, http["reused"]),
+                                   ({"connection": "new"}, http["requests"] - http["reused"])], "counter")
+        yield from metrics.family("dashboard_upstream_tls_handshake_seconds_total",
+                                  "Time spent in upstream TLS handshakes.", [({}, http["handshake_seconds"])], "counter")
+        yield from metrics.family("dashboard_upstream_http_retries_total", "Upstream HTTP requests retried.",
+                                  [({}, http["retried"])], "counter")
+
+@app.route('/metrics')
+def prometheus_metrics():
+    return Response(metrics.exposition(cache_metrics()), mimetype='text/plain; version=0.0.4')
+
+@app.route('/prefetch/status')
+def prefetch_status():
+    return jsonify(prefetch.status() or {"running": False})
+
+if prefetch.PREFETCH_IN_APP:
+    prefetch.start()
 
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,230 @@
+"""ASGI entry point: /result and /api/financials on asyncio, every other route on the Flask app.
+
+    uvicorn asgi:app --workers 4
+    gunicorn asgi:app -k uvicorn.workers.UvicornWorker -w 4
+
+The two data routes run as coroutines inside a Flask request context, so
+routing, hooks, templates and metrics are the same as under WSGI; their
+upstream misses are awaited on the bounded fetch pool instead of holding a
+thread each, and the blocking steps around them (shared-cache reads and
+writes, the pandas transform, rendering and compression) run on a small
+render pool so the event loop never waits on them. Everything else (compare, export, screen, ...) is handed to
+the WSGI app on a thread pool and streamed back chunk by chunk.
+"""
+import asyncio
+import contextvars
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import g, redirect, request, url_for
+from werkzeug.exceptions import HTTPException
+
+import fundamentals
+import symbols
+from app import (app as flask_app, assemble_report, cached_result, financials_response, get_sections, get_years,
+                 render_result, result_key, section_datasets, unchanged_result, unknown_financials, unknown_result)
+
+# Threads for the routes still served by the WSGI app
+ASGI_WSGI_THREADS = int(os.environ.get("ASGI_WSGI_THREADS", 32))
+# Threads for the blocking steps of the async routes: cache I/O, transform, render, compression
+ASGI_RENDER_THREADS = int(os.environ.get("ASGI_RENDER_THREADS", 8))
+# Chunks a streamed WSGI response may run ahead of a slow client
+ASGI_STREAM_BUFFER = 8
+
+wsgi_pool = ThreadPoolExecutor(max_workers=ASGI_WSGI_THREADS, thread_name_prefix="wsgi")
+render_pool = ThreadPoolExecutor(max_workers=ASGI_RENDER_THREADS, thread_name_prefix="render")
+
+
+def offload(fn, *args):
+    # Runs on the render pool inside this request's context (request, g, the app)
+    return asyncio.get_running_loop().run_in_executor(render_pool, contextvars.copy_context().run, fn, *args)
+
+
+def cached_or_unchanged(key, ticker, years, sections):
+    return cached_result(key) or unchanged_result(ticker, years, sections)
+
+
+async def fetch_report(ticker, years, sections):
+    timings = {}
+    with g.timer.stage('fetch'):
+        fetched = await fundamentals.get_datasets_async(ticker, section_datasets(sections), timings=timings)
+    return await offload(assemble_report, ticker, years, sections, fetched, timings)
+
+
+async def result():
+    # Same answers as app.result(); the page is rendered whole rather than streamed
+    ticker = request.args.get('ticker', '').upper().strip()
+    years = get_years()
+    sections = get_sections()
+    if not ticker:
+        return redirect(url_for('home'))
+    if not symbols.accepted(ticker):
+        return unknown_result(ticker)
+    key = result_key(ticker, years, sections)
+    cached = await offload(cached_or_unchanged, key, ticker, years, sections)
+    if cached is not None:
+        return cached
+    report, errors = await fetch_report(ticker, years, sections)
+    return await offload(render_result, ticker, report, errors, key)
+
+
+async def api_financials(ticker):
+    ticker = ticker.upper().strip()
+    if not symbols.accepted(ticker):
+        return unknown_financials(ticker)
+    report, errors = await fetch_report(ticker, get_years(), get_sections())
+    return await offload(financials_response, ticker, report, errors)
+
+
+ASYNC_VIEWS = {"result": result, "api_financials": api_financials}
+
+
+def wsgi_environ(scope, body):
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope["query_string"].decode("latin-1"),
+        "SERVER_PROTOCOL": "HTTP/" + scope.get("http_version", "1.1"),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    server = scope.get("server") or ("localhost", 80)
+    environ["SERVER_NAME"], environ["SERVER_PORT"] = server[0], str(server[1])
+    if scope.get("client"):
+        environ["REMOTE_ADDR"], environ["REMOTE_PORT"] = scope["client"][0], str(scope["client"][1])
+    # The body has been read in full (and de-chunked) by now
+    environ["CONTENT_LENGTH"] = str(len(body))
+    for name, value in scope["headers"]:
+        name, value = name.decode("latin-1"), value.decode("latin-1")
+        if name == "content-type":
+            environ["CONTENT_TYPE"] = value
+        elif name in ("content-length", "transfer-encoding"):
+            continue
+        else:
+            key = "HTTP_" + name.upper().replace("-", "_")
+            environ[key] = environ[key] + "," + value if key in environ else value
+    return environ
+
+
+def response_start(status, headers):
+    return {"type": "http.response.start", "status": status,
+            "headers": [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers]}
+
+
+async def read_body(receive):
+    body = b""
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            return body
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            return body
+
+
+async def serve_async(view, view_args, environ, send):
+    # Flask's full_dispatch_request, with the view awaited
+    with flask_app.request_context(environ):
+        try:
+            try:
+                rv = flask_app.preprocess_request()
+                if rv is None:
+                    rv = await view(**view_args)
+            except Exception as exc:
+                rv = flask_app.handle_user_exception(exc)
+            response = flask_app.finalize_request(rv)
+        except Exception as exc:
+            response = flask_app.handle_exception(exc)
+        headers = response.get_wsgi_headers(environ)
+        body = b"".join(response.get_app_iter(environ))
+    await send(response_start(response.status_code, headers.to_wsgi_list()))
+    await send({"type": "http.response.body", "body": body})
+
+
+async def serve_wsgi(environ, send):
+    # The WSGI app runs on a pool thread; its chunks come back through a small
+    # queue so streamed responses (compare, export) keep flowing with backpressure
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=ASGI_STREAM_BUFFER)
+    closed = False
+
+    def put(message):
+        asyncio.run_coroutine_threadsafe(queue.put(message), loop).result()
+
+    def run():
+        try:
+            response = []
+            iterable = flask_app(environ, lambda status, headers, exc_info=None: response.extend([status, headers]))
+            try:
+                put(("start", response))
+                for chunk in iterable:
+                    if closed:
+                        break
+                    if chunk:
+                        put(("body", chunk))
+            finally:
+                if hasattr(iterable, "close"):
+                    iterable.close()
+            put(("end", None))
+        except BaseException as exc:
+            put(("error", exc))
+
+    worker = loop.run_in_executor(wsgi_pool, run)
+    try:
+        while True:
+            kind, payload = await queue.get()
+            if kind == "start":
+                status, headers = payload
+                await send(response_start(int(status.split(" ", 1)[0]), headers))
+            elif kind == "body":
+                await send({"type": "http.response.body", "body": payload, "more_body": True})
+            elif kind == "end":
+                await send({"type": "http.response.body", "body": b""})
+                break
+            else:
+                raise payload
+    finally:
+        if not worker.done():
+            # Client went away mid-stream: stop the generator and let the thread finish
+            closed = True
+            while not worker.done():
+                try:
+                    queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    await asyncio.sleep(0.01)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            wsgi_pool.shutdown(wait=False)
+            render_pool.shutdown(wait=False)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await lifespan(receive, send)
+    if scope["type"] != "http":
+        return
+    environ = wsgi_environ(scope, await read_body(receive))
+    try:
+        endpoint, view_args = flask_app.url_map.bind_to_environ(environ).match()
+    except HTTPException:
+        endpoint = None
+    if endpoint in ASYNC_VIEWS:
+        await serve_async(ASYNC_VIEWS[endpoint], view_args, environ, send)
+    else:
+        await serve_wsgi(environ, send)
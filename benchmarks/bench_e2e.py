@@ -0,0 +1,319 @@
+"""End-to-end benchmark of the / and /result routes through the Flask test client.
+
+Yahoo is replaced by a deterministic in-process stub (yfinance.Ticker is
+patched before the app is imported), so runs are offline and repeatable and
+work against any revision of the app. Reports p50/p95/p99 latency,
+throughput and peak traced allocation per request for:
+
+  home                      GET /
+  result cold  years=N      GET /result for a ticker never seen before
+  result warm  years=N      GET /result for a ticker already fetched
+  get_with_ttm years=N      helper on a 10-year statement frame
+  format_number             helper over a spread of magnitudes
+
+Cold requests still go through the stub, so --latency adds a simulated
+upstream round trip to every stubbed fetch.
+
+    python benchmarks/bench_e2e.py [--iterations N] [--years 1-10] [--latency S] [--concurrency C]
+    python benchmarks/bench_e2e.py --compare BASE [HEAD] [--threshold PCT]
+
+--compare checks each revision out into a temporary git worktree ("WORKTREE"
+means the current checkout, uncommitted changes included), runs the suite
+there in a fresh interpreter and prints the p50/p95 change per scenario. It
+exits non-zero when any scenario's p50 regresses by more than --threshold
+percent.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+
+INCOME_ROWS = ["Total Revenue", "Cost Of Revenue", "Gross Profit", "Operating Expense", "Operating Income",
+               "Net Income", "Basic EPS", "Diluted EPS", "EBITDA", "Interest Expense", "Tax Provision",
+               "Research And Development", "Selling General And Administration"]
+BALANCE_ROWS = ["Total Assets", "Total Liabilities Net Minority Interest", "Total Equity Gross Minority Interest",
+                "Working Capital", "Long Term Debt", "Total Debt", "Cash And Cash Equivalents", "Inventory",
+                "Accounts Receivable", "Goodwill"]
+CASHFLOW_ROWS = ["Operating Cash Flow", "Investing Cash Flow", "Financing Cash Flow", "Repayment Of Debt",
+                 "Free Cash Flow", "Capital Expenditure", "Issuance Of Debt", "Depreciation And Amortization"]
+NUM_YEARS = 10
+
+
+def stub_frame(ticker, rows, salt):
+    rng = np.random.default_rng(zlib.crc32(f"{ticker}:{salt}".encode()))
+    columns = [pd.Timestamp(f"{2024 - i}-12-31") for i in range(NUM_YEARS)]
+    return pd.DataFrame(rng.uniform(-5e9, 9e10, size=(len(rows), NUM_YEARS)), index=rows, columns=columns)
+
+
+class StubTicker:
+    """Stands in for yfinance.Ticker with deterministic data for any symbol."""
+
+    latency = 0.0
+
+    def __init__(self, ticker, session=None, **kwargs):
+        self.ticker = ticker
+
+    def _wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    @property
+    def info(self):
+        self._wait()
+        return {
+            "shortName": f"{self.ticker} Corp", "currency": "USD", "marketCap": 2.1e12,
+            "totalRevenue": 5.7e11, "netIncomeToCommon": 3.0e10, "industry": "Software", "sector": "Technology",
+            "fullTimeEmployees": 150000, "website": "https://example.com", "city": "Springfield",
+            "country": "United States", "exchange": "NMS",
+            "longBusinessSummary": "Sample business summary. " * 20,
+            "companyOfficers": [{"name": f"Officer {i}", "title": "Director"} for i in range(8)],
+        }
+
+    @property
+    def financials(self):
+        self._wait()
+        return stub_frame(self.ticker, INCOME_ROWS, 1)
+
+    @property
+    def balance_sheet(self):
+        self._wait()
+        return stub_frame(self.ticker, BALANCE_ROWS, 2)
+
+    @property
+    def cashflow(self):
+        self._wait()
+        return stub_frame(self.ticker, CASHFLOW_ROWS, 3)
+
+
+def load_app(tree, latency):
+    # Keep every persistent layer out of the measurement and off the disk
+    os.environ["STORE_PATH"] = ""
+    os.environ["SHARED_CACHE_PATH"] = ""
+    os.environ.pop("PREFETCH_IN_APP", None)
+    os.environ.pop("DATA_PROVIDER", None)
+    import yfinance
+    StubTicker.latency = latency
+    yfinance.Ticker = StubTicker
+    sys.path.insert(0, tree)
+    import app as dashboard
+    return dashboard
+
+
+def percentiles(samples):
+    if len(samples) < 2:
+        return samples[0], samples[0], samples[0]
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return cuts[49], cuts[94], cuts[98]
+
+
+def measure(fn, iterations, concurrency=1):
+    # Latency samples and throughput; with concurrency > 1 the calls are
+    # spread over that many threads and throughput is wall-clock based
+    samples = []
+    lock = threading.Lock()
+
+    def timed(i):
+        start = time.perf_counter()
+        fn(i)
+        elapsed = time.perf_counter() - start
+        with lock:
+            samples.append(elapsed)
+
+    start = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(timed, range(iterations)))
+    else:
+        for i in range(iterations):
+            timed(i)
+    wall = time.perf_counter() - start
+    return samples, iterations / wall
+
+
+def allocations(fn, iterations):
+    # Peak traced bytes above the pre-call baseline, and bytes still held afterwards
+    peaks, retained = [], []
+    tracemalloc.start()
+    try:
+        for i in range(iterations):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            fn(i)
+            current, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+            retained.append(current - before)
+    finally:
+        tracemalloc.stop()
+    return statistics.median(peaks), statistics.median(retained)
+
+
+def run_scenario(name, fn, iterations, concurrency, alloc_iterations):
+    samples, throughput = measure(fn, iterations, concurrency)
+    p50, p95, p99 = percentiles(samples)
+    peak, retained = allocations(fn, alloc_iterations) if alloc_iterations else (None, None)
+    row = {"p50": p50, "p95": p95, "p99": p99, "mean": statistics.mean(samples), "throughput": throughput,
+           "alloc_peak": peak, "alloc_retained": retained, "iterations": iterations}
+    alloc = f"{peak / 1024:9.1f} KiB" if peak is not None else f"{'-':>13}"
+    print(f"{name:<24} p50 {p50 * 1e3:8.3f} ms  p95 {p95 * 1e3:8.3f} ms  p99 {p99 * 1e3:8.3f} ms  "
+          f"{throughput:9.1f} req/s  peak alloc {alloc}", flush=True)
+    return row
+
+
+def parse_years(spec):
+    if "-" in spec:
+        low, high = spec.split("-", 1)
+        return list(range(int(low), int(high) + 1))
+    return [int(y) for y in spec.split(",")]
+
+
+def run_suite(args):
+    dashboard = load_app(args.tree, args.latency)
+    local = threading.local()
+    counter = iter(range(10 ** 9))
+    counter_lock = threading.Lock()
+
+    def get(path):
+        # One test client per thread; Flask's test client is not thread-safe
+        c = getattr(local, "client", None)
+        if c is None:
+            c = local.client = dashboard.app.test_client()
+        response = c.get(path)
+        if response.status_code != 200:
+            raise SystemExit(f"GET {path} returned {response.status_code}")
+        response.get_data()
+        return response
+
+    def fresh_ticker(_):
+        with counter_lock:
+            return f"C{next(counter):06d}"
+
+    results = {}
+    alloc_iterations = 0 if args.no_alloc else max(5, args.iterations // 10)
+    print(f"tree {args.tree}  iterations {args.iterations}  concurrency {args.concurrency}  "
+          f"stub latency {args.latency * 1e3:.0f} ms")
+
+    get("/")
+    results["home"] = run_scenario("home", lambda i: get("/"), args.iterations, args.concurrency, alloc_iterations)
+
+    cold_iterations = args.cold_iterations or args.iterations
+    for years in args.years:
+        results[f"result cold years={years}"] = run_scenario(
+            f"result cold  years={years}",
+            lambda i, y=years: get(f"/result?ticker={fresh_ticker(i)}&years={y}"),
+            cold_iterations, args.concurrency, min(alloc_iterations, cold_iterations))
+    for years in args.years:
+        path = f"/result?ticker=WARM&years={years}"
+        get(path)
+        results[f"result warm years={years}"] = run_scenario(
+            f"result warm  years={years}", lambda i, p=path: get(p),
+            args.iterations, args.concurrency, alloc_iterations)
+
+    frame = stub_frame("HELPER", INCOME_ROWS, 1)
+    for years in args.years:
+        results[f"get_with_ttm years={years}"] = run_scenario(
+            f"get_with_ttm years={years}", lambda i, y=years: dashboard.get_with_ttm(frame, y),
+            args.iterations * 10, 1, 0)
+    values = list(10 ** np.random.default_rng(0).uniform(-2, 14, size=1000))
+    results["format_number x1000"] = run_scenario(
+        "format_number x1000", lambda i: [dashboard.format_number(v) for v in values],
+        args.iterations, 1, 0)
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+    return results
+
+
+def checkout(rev, root):
+    if rev == "WORKTREE":
+        return REPO_DIR, None
+    path = os.path.join(root, rev.replace("/", "_"))
+    subprocess.run(["git", "-C", REPO_DIR, "worktree", "add", "--detach", "--quiet", path, rev], check=True)
+    return path, path
+
+
+def run_revision(rev, root, passthrough):
+    tree, worktree = checkout(rev, root)
+    out = os.path.join(root, rev.replace("/", "_") + ".json")
+    try:
+        print(f"\n== {rev}", flush=True)
+        subprocess.run([sys.executable, os.path.abspath(__file__), "--tree", tree, "--json", out] + passthrough,
+                       check=True)
+    finally:
+        if worktree is not None:
+            subprocess.run(["git", "-C", REPO_DIR, "worktree", "remove", "--force", worktree], check=False)
+    with open(out) as fh:
+        return json.load(fh)
+
+
+def compare(args, passthrough):
+    base_rev, head_rev = args.compare[0], args.compare[1] if len(args.compare) > 1 else "WORKTREE"
+    with tempfile.TemporaryDirectory(prefix="bench-e2e-") as root:
+        base = run_revision(base_rev, root, passthrough)
+        head = run_revision(head_rev, root, passthrough)
+
+    print(f"\n{'scenario':<24} {base_rev[:12]:>12} {head_rev[:12]:>12}   p50 change   p95 change")
+    regressions = []
+    for name, new in head.items():
+        old = base.get(name)
+        if old is None:
+            print(f"{name:<24} {'-':>12} {new['p50'] * 1e3:9.3f} ms")
+            continue
+        p50_change = (new["p50"] / old["p50"] - 1) * 100
+        p95_change = (new["p95"] / old["p95"] - 1) * 100
+        flag = ""
+        if p50_change > args.threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<24} {old['p50'] * 1e3:9.3f} ms {new['p50'] * 1e3:9.3f} ms   "
+              f"{p50_change:+9.1f}%   {p95_change:+9.1f}%{flag}")
+    if regressions:
+        print(f"\n{len(regressions)} scenario(s) regressed by more than {args.threshold}% at p50")
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--cold-iterations", type=int, default=0,
+                        help="Iterations for cold scenarios (default: --iterations).")
+    parser.add_argument("--years", type=parse_years, default=parse_years("1-10"),
+                        help="Years to render, e.g. 1-10 or 1,4,10.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every stubbed fetch.")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--no-alloc", action="store_true", help="Skip the tracemalloc pass.")
+    parser.add_argument("--json", help="Write results to this file.")
+    parser.add_argument("--tree", default=REPO_DIR, help=argparse.SUPPRESS)
+    parser.add_argument("--compare", nargs="+", metavar="REV", help="BASE [HEAD]; HEAD defaults to WORKTREE.")
+    parser.add_argument("--threshold", type=float, default=10.0, help="p50 regression tolerance in percent.")
+    args = parser.parse_args()
+
+    if args.compare:
+        passthrough = ["--iterations", str(args.iterations), "--latency", str(args.latency),
+                       "--concurrency", str(args.concurrency),
+                       "--years", ",".join(str(y) for y in args.years)]
+        if args.cold_iterations:
+            passthrough += ["--cold-iterations", str(args.cold_iterations)]
+        if args.no_alloc:
+            passthrough.append("--no-alloc")
+        compare(args, passthrough)
+    else:
+        run_suite(args)
+
+
+if __name__ == "__main__":
+    main()
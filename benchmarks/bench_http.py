@@ -0,0 +1,56 @@
+"""Connection reuse of the pooled upstream session against live Yahoo Finance.
+
+Fetches one dataset for each ticker through YFinanceProvider and the
+process-wide pooled session, on a thread pool like the app's fetch stage,
+and repeats the pass. For each pass it prints wall time, the HTTP requests
+made, how many were served on an already open connection, the new
+connections opened and the time spent in TLS handshakes. The first pass
+pays the handshakes; later passes should show none. Needs network access.
+
+    python benchmarks/bench_http.py [--tickers AAPL,MSFT,...] [--dataset financials] [--workers N] [--passes N]
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from http_session import pooled_session  # noqa: E402
+from providers import YFinanceProvider  # noqa: E402
+
+DEFAULT_TICKERS = "AAPL,MSFT,GOOGL,AMZN,META,NVDA,TSLA,JPM,V,WMT,KO,PEP,XOM,CVX,INTC,ORCL"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickers", default=DEFAULT_TICKERS)
+    parser.add_argument("--dataset", default="financials")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--passes", type=int, default=3)
+    args = parser.parse_args()
+
+    session = pooled_session()
+    if session is None:
+        sys.exit("curl_cffi is not installed; yfinance manages its own sessions")
+    provider = YFinanceProvider(session)
+    tickers = [ticker.strip().upper() for ticker in args.tickers.split(",") if ticker.strip()]
+
+    print(f"{len(tickers)} tickers, {args.dataset}, {args.workers} threads")
+    print(f"{'pass':<6} {'seconds':>8} {'requests':>9} {'reused':>7} {'new conns':>10} {'TLS ms':>8} {'errors':>7}")
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        for number in range(1, args.passes + 1):
+            before = session.stats()
+            start = time.perf_counter()
+            futures = [pool.submit(provider.fetch, ticker, args.dataset) for ticker in tickers]
+            errors = sum(future.exception() is not None for future in futures)
+            elapsed = time.perf_counter() - start
+            after = session.stats()
+            print(f"{number:<6} {elapsed:>8.2f} {after['requests'] - before['requests']:>9} "
+                  f"{after['reused'] - before['reused']:>7} {after['connections'] - before['connections']:>10} "
+                  f"{(after['handshake_seconds'] - before['handshake_seconds']) * 1000:>8.1f} {errors:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""Load test of the WSGI app under gunicorn against the ASGI app under uvicorn.
+
+Records replay fixtures for N synthetic tickers (the bench_e2e stub data),
+then starts each server with DATA_PROVIDER=replay, PROVIDER_LATENCY seconds
+per upstream fetch and no store or shared cache, and sends N requests for
+distinct tickers, so every one waits on upstream, at the given concurrency
+from an asyncio client. Reports throughput and p50/p95/p99 latency:
+
+  gunicorn sync      app:app, sync workers (one request per worker at a time)
+  gunicorn gthread   app:app, --threads per worker
+  uvicorn asgi       asgi:app, event loop per worker
+
+    python benchmarks/bench_load.py [--requests N] [--concurrency C] [--latency S] [--workers W]
+                                    [--path /result|/api/financials] [--servers NAME,...]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+
+from bench_e2e import StubTicker  # noqa: E402
+from providers import ReplayProvider  # noqa: E402
+
+DATASETS = ("info", "financials", "balance_sheet", "cashflow")
+
+
+def servers(workers, threads, port):
+    bind = f"127.0.0.1:{port}"
+    return {
+        "gunicorn sync": ["gunicorn", "-w", str(workers), "-b", bind, "--log-level", "warning", "app:app"],
+        "gunicorn gthread": ["gunicorn", "-w", str(workers), "-k", "gthread", "--threads", str(threads),
+                             "-b", bind, "--log-level", "warning", "app:app"],
+        "uvicorn asgi": ["uvicorn", "asgi:app", "--workers", str(workers), "--host", "127.0.0.1",
+                         "--port", str(port), "--log-level", "warning", "--no-access-log"],
+    }
+
+
+def record_fixtures(root, tickers):
+    replay = ReplayProvider(root)
+    for ticker in tickers:
+        stub = StubTicker(ticker)
+        for dataset in DATASETS:
+            replay.write(ticker, dataset, getattr(stub, dataset))
+
+
+def wait_ready(port, process, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("server exited during startup")
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1).read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("server did not come up")
+
+
+async def fetch(port, path):
+    start = time.perf_counter()
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n\r\n".encode())
+    await writer.drain()
+    data = await reader.read()
+    writer.close()
+    return int(data.split(b" ", 2)[1]), time.perf_counter() - start
+
+
+async def load(port, paths, concurrency):
+    queue = list(reversed(paths))
+    latencies, failures = [], 0
+
+    async def client():
+        nonlocal failures
+        while queue:
+            path = queue.pop()
+            try:
+                status, seconds = await fetch(port, path)
+            except OSError:
+                failures += 1
+                continue
+            if status == 200:
+                latencies.append(seconds)
+            else:
+                failures += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return latencies, failures, time.perf_counter() - start
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.25, help="Simulated upstream seconds per fetch.")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=32, help="Threads per gthread worker.")
+    parser.add_argument("--fetch-workers", type=int, default=64, help="FETCH_WORKERS/UPSTREAM_CONCURRENCY.")
+    parser.add_argument("--path", default="/result")
+    parser.add_argument("--servers", default="gunicorn sync,gunicorn gthread,uvicorn asgi")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        tickers = [f"L{i:05d}" for i in range(args.requests)]
+        record_fixtures(root, tickers)
+        env = dict(os.environ, DATA_PROVIDER="replay", PROVIDER_FIXTURES=root, PROVIDER_LATENCY=str(args.latency),
+                   STORE_PATH="", SHARED_CACHE_PATH="", PREFETCH_IN_APP="0", FETCH_TIMEOUT="60",
+                   FETCH_WORKERS=str(args.fetch_workers), UPSTREAM_CONCURRENCY=str(args.fetch_workers))
+        if args.path == "/result":
+            paths = [f"/result?ticker={ticker}" for ticker in tickers]
+        else:
+            paths = [f"{args.path}/{ticker}" for ticker in tickers]
+
+        print(f"{args.requests} cold requests to {args.path}, concurrency {args.concurrency}, "
+              f"{args.latency * 1000:.0f} ms per upstream fetch, {args.workers} workers")
+        print(f"{'server':<18} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'failed':>7}")
+        wanted = [name.strip() for name in args.servers.split(",")]
+        for name, command in servers(args.workers, args.threads, args.port).items():
+            if name not in wanted:
+                continue
+            process = subprocess.Popen(command, cwd=REPO_DIR, env=env)
+            try:
+                wait_ready(args.port, process)
+                latencies, failures, elapsed = asyncio.run(load(args.port, paths, args.concurrency))
+            finally:
+                process.terminate()
+                process.wait()
+            if not latencies:
+                print(f"{name:<18} {'-':>8} {'-':>8} {'-':>8} {'-':>8} {failures:>7}")
+                continue
+            print(f"{name:<18} {len(latencies) / elapsed:>8.1f} {statistics.median(latencies) * 1000:>8.0f} "
+                  f"{percentile(latencies, 0.95) * 1000:>8.0f} {percentile(latencies, 0.99) * 1000:>8.0f} "
+                  f"{failures:>7}")
+
+
+if __name__ == "__main__":
+    main()
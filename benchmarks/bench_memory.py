@@ -0,0 +1,142 @@
+"""Memory per ticker of the cached fundamentals: provider objects against compact records.
+
+Builds yfinance-sized datasets for N synthetic tickers (info with ~150 keys
+and ten company officers, annual statements with the usual 40-70 line items
+over 5 periods), then measures with tracemalloc what holding all of them
+costs as the provider returns them and as the records the fundamentals
+cache now keeps. Also checks that every section and the derived ratios read
+the same numbers from a record as from the original frame, and times the
+record -> DataFrame rebuild a cache hit pays. Exits non-zero on a mismatch.
+
+    python benchmarks/bench_memory.py [--tickers N]
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+os.environ.setdefault("STORE_PATH", "")
+os.environ.setdefault("SHARED_CACHE_PATH", "")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402,F401  (registers the rows and info keys the page reads)
+from derived import derive  # noqa: E402
+from records import compact, expand  # noqa: E402
+from transform import extract_metrics  # noqa: E402
+
+STATEMENT_ROWS = {"financials": 45, "balance_sheet": 70, "cashflow": 55}
+DATASETS = ("info",) + tuple(STATEMENT_ROWS)
+PERIODS = [pd.Timestamp(f"{2024 - i}-12-31") for i in range(5)]
+INFO_KEYS = 150
+
+
+def row_names(dataset):
+    # The rows the app reads, padded out with other line items like Yahoo's
+    wanted = [row for rows in app.metrics_sections.values() for row in rows.values()]
+    wanted += ["Total Debt", "Cash And Cash Equivalents", "Free Cash Flow", "Capital Expenditure", "Net Debt"]
+    return wanted + [f"{dataset} Line Item {i}" for i in range(STATEMENT_ROWS[dataset] - len(wanted))]
+
+
+def sample_info(rng, ticker):
+    info = {f"field{i}": float(rng.uniform(0, 1e9)) if i % 3 else f"value {i} {ticker}" for i in range(INFO_KEYS)}
+    info.update({
+        "shortName": f"{ticker} Holdings Inc.", "industry": "Software - Infrastructure", "sector": "Technology",
+        "website": f"https://www.{ticker.lower()}.com", "fullTimeEmployees": int(rng.integers(100, 200000)),
+        "address1": "1 Example Way", "city": "Springfield", "state": "CA", "country": "United States",
+        "phone": "555 0100", "exchange": "NMS", "currency": "USD", "marketCap": int(rng.integers(1e8, 3e12)),
+        "totalRevenue": int(rng.integers(1e7, 5e11)), "netIncomeToCommon": int(rng.integers(-1e9, 1e11)),
+        "longBusinessSummary": f"{ticker} designs, develops and sells products worldwide. " * 25,
+        "companyOfficers": [{"maxAge": 1, "name": f"Officer {i}", "age": 50 + i, "title": "Executive Vice President",
+                             "yearBorn": 1970 + i, "fiscalYear": 2024, "totalPay": 1000000 + i,
+                             "exercisedValue": 0, "unexercisedValue": 0} for i in range(10)],
+    })
+    return info
+
+
+def sample_datasets(rng, ticker):
+    values = {"info": sample_info(rng, ticker)}
+    for dataset in STATEMENT_ROWS:
+        rows = row_names(dataset)
+        # yfinance hands statements back with object columns more often than not
+        values[dataset] = pd.DataFrame(rng.uniform(-5e9, 9e10, size=(len(rows), len(PERIODS))).astype(object),
+                                       index=rows, columns=PERIODS)
+    return values
+
+
+def traced(build):
+    gc.collect()
+    tracemalloc.start()
+    held = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return held, size
+
+
+def check_parity(raw, record):
+    failures = 0
+    for section, dataset in app.SECTION_DATASETS.items():
+        expected = extract_metrics(raw[dataset], app.metrics_sections[section])
+        actual = extract_metrics(expand(record[dataset]), app.metrics_sections[section])
+        if expected[0] != actual[0] or not np.allclose(expected[1], actual[1], equal_nan=True):
+            failures += 1
+    labels, derived = derive({d: raw[d] for d in STATEMENT_ROWS})
+    labels2, derived2 = derive({d: expand(record[d]) for d in STATEMENT_ROWS})
+    if labels != labels2 or any(not np.allclose(derived[m], derived2[m], equal_nan=True) for m in derived):
+        failures += 1
+    info, compact_info = raw["info"], expand(record["info"])
+    if (app.report_header("T", 4, info, {}, {}) != app.report_header("T", 4, compact_info, {}, {})):
+        failures += 1
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickers", type=int, default=10000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(23)
+    tickers = [f"M{i:05d}" for i in range(args.tickers)]
+    start = time.perf_counter()
+    raw, raw_bytes = traced(lambda: {ticker: sample_datasets(rng, ticker) for ticker in tickers})
+    print(f"Generated {len(tickers)} tickers in {time.perf_counter() - start:.1f}s")
+
+    held, record_bytes = traced(lambda: {ticker: {dataset: compact(dataset, value) for dataset, value in data.items()}
+                                         for ticker, data in raw.items()})
+    # Timed again outside tracemalloc, which slows allocation-heavy code down
+    sample = tickers[:1000]
+    start = time.perf_counter()
+    for ticker in sample:
+        for dataset, value in raw[ticker].items():
+            compact(dataset, value)
+    build = (time.perf_counter() - start) / len(sample)
+    estimated = sum(sys.getsizeof(record) for data in held.values() for record in data.values())
+
+    n = len(tickers)
+    print(f"{'':<22} {'bytes/ticker':>13} {'total MB':>9}")
+    print(f"{'provider objects':<22} {raw_bytes / n:>13,.0f} {raw_bytes / 1e6:>9.1f}")
+    print(f"{'compact records':<22} {record_bytes / n:>13,.0f} {record_bytes / 1e6:>9.1f}")
+    print(f"{'  cache estimate':<22} {estimated / n:>13,.0f} {estimated / 1e6:>9.1f}")
+    print(f"x{raw_bytes / record_bytes:.1f} smaller; compacting takes {build * 1e6:.0f} us per ticker")
+
+    record = held[tickers[0]]["financials"]
+    start = time.perf_counter()
+    for _ in range(10000):
+        record._frame = None
+        record.frame()
+    print(f"record -> DataFrame on a cache hit: {(time.perf_counter() - start) * 100:.1f} us")
+
+    failures = sum(check_parity(raw[ticker], held[ticker]) for ticker in tickers[:200])
+    if failures:
+        print(f"{failures} mismatches")
+        sys.exit(1)
+    print("Sections, ratios and profile read the same from records")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Micro-benchmark: per-request render cost of the / and /result pages.
+
+"before" compiles the template source on every call, which is what
+render_template_string did for the old inline pages; "after" renders the
+cached, precompiled templates (and the precomputed home page).
+
+    python benchmarks/bench_render.py [--iterations N]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import render_template, render_template_string  # noqa: E402
+
+import app as dashboard  # noqa: E402
+
+
+def sample_frame(metrics, num_years=5, seed=0):
+    rng = np.random.default_rng(seed)
+    columns = [pd.Timestamp(f"{2024 - i}-12-31") for i in range(num_years)]
+    rows = [key for section in metrics for key in section.values()]
+    return pd.DataFrame(rng.uniform(-5e9, 9e10, size=(len(rows), num_years)), index=rows, columns=columns)
+
+
+def sample_data():
+    sections = dashboard.metrics_sections
+    info = {
+        "shortName": "Sample Corp", "currency": "USD", "marketCap": 2.1e12,
+        "totalRevenue": 5.7e11, "netIncomeToCommon": 3.0e10,
+        "longBusinessSummary": "Sample business summary. " * 20,
+        "companyOfficers": [{"name": f"Officer {i}", "title": "Director"} for i in range(8)],
+    }
+    return {
+        "info": info,
+        "financials": sample_frame([sections["Income Statements"]], seed=1),
+        "balance_sheet": sample_frame([sections["Balance Sheets"]], seed=2),
+        "cashflow": sample_frame([sections["Cashflow"]], seed=3),
+    }
+
+
+def timeit(fn, iterations):
+    fn()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def report(name, samples):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{name:<28} mean {statistics.mean(samples) * 1e6:9.1f} us   "
+          f"p50 {statistics.median(samples) * 1e6:9.1f} us   p95 {p95 * 1e6:9.1f} us")
+    return statistics.mean(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+
+    flask_app = dashboard.app
+    context = dashboard.build_report("SMPL", 4, sample_data(), {})
+    loader = flask_app.jinja_env.loader
+    result_source = loader.get_source(flask_app.jinja_env, "result.html")[0]
+    home_source = loader.get_source(flask_app.jinja_env, "home.html")[0]
+
+    with flask_app.test_request_context("/result?ticker=SMPL&years=4"):
+        before = report("result: compile per request", timeit(lambda: render_template_string(result_source, **context), args.iterations))
+        after = report("result: precompiled", timeit(lambda: render_template("result.html", **context), args.iterations))
+        print(f"{'':<28} speedup x{before / after:.1f}")
+        before = report("home: compile per request", timeit(lambda: render_template_string(home_source), args.iterations))
+        after = report("home: precomputed", timeit(dashboard.home_page, args.iterations))
+        print(f"{'':<28} speedup x{before / after:.1f}")
+
+
+if __name__ == "__main__":
+    main()
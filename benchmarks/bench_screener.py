@@ -0,0 +1,134 @@
+"""Benchmark the universe screener on a synthetic universe.
+
+Builds the columnar panel for N synthetic tickers (with staggered fiscal
+year ends), checks a sample of panel rows against derive() for the same
+frames, then times typical filter/sort/page queries and an incremental
+refresh of 1% of the universe against a full rebuild. Exits non-zero on
+any mismatch.
+
+    python benchmarks/bench_screener.py [--tickers N] [--repeat N]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+# Keep the benchmark away from the app's store and shared cache
+os.environ.setdefault("STORE_PATH", "")
+os.environ.setdefault("SHARED_CACHE_PATH", "")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from derived import derive  # noqa: E402
+from screener import DERIVED_FIELDS, Screener  # noqa: E402
+
+QUERIES = [
+    ("", "", "everything, unsorted"),
+    ("revenue_growth > 10", "-revenue_growth", "growth, by growth"),
+    ("revenue_growth > 5 and net_debt_to_ebitda < 1", "-revenue_growth, net_margin", "growth + leverage"),
+    ("gross_margin > 40 and operating_margin > gross_margin / 2", "-free_cash_flow", "margins"),
+    ("revenue > revenue[1] and revenue[1] > revenue[2] and not net_margin < 0", "-revenue_cagr_3y", "3 years up"),
+    ("abs(net_income_growth) < 5 or free_cash_flow / revenue * 100 > 15", "-net_margin", "fcf yield"),
+]
+
+
+def sample_frames(rng, years=5):
+    end = 2024 - int(rng.integers(0, 2))
+    columns = [pd.Timestamp(f"{end - i}-{rng.choice(['03-31', '06-30', '12-31'])}") for i in range(years)]
+    revenue = rng.uniform(1e8, 1e11) * np.cumprod(rng.uniform(0.85, 1.3, size=years))[::-1]
+    margin = rng.uniform(0.1, 0.7)
+    financials = pd.DataFrame({
+        "Total Revenue": revenue,
+        "Gross Profit": revenue * margin,
+        "Operating Income": revenue * margin * rng.uniform(-0.2, 0.6, size=years),
+        "Net Income": revenue * margin * rng.uniform(-0.3, 0.4, size=years),
+        "EBITDA": revenue * margin * rng.uniform(0.2, 0.8, size=years),
+    }, index=columns).T
+    balance = pd.DataFrame({
+        "Total Debt": revenue * rng.uniform(0, 1.5, size=years),
+        "Cash And Cash Equivalents": revenue * rng.uniform(0, 0.5, size=years),
+    }, index=columns).T
+    cashflow = pd.DataFrame({
+        "Operating Cash Flow": revenue * rng.uniform(-0.05, 0.3, size=years),
+        "Capital Expenditure": -revenue * rng.uniform(0, 0.1, size=years),
+    }, index=columns).T
+    if rng.random() < 0.05:
+        financials = financials.drop(index="Gross Profit")
+    return {"financials": financials, "balance_sheet": balance, "cashflow": cashflow}
+
+
+def check_parity(panel, frames_by_ticker, tickers):
+    failures = 0
+    for ticker in tickers:
+        labels, metrics = derive(frames_by_ticker[ticker])
+        annual = [i for i, label in enumerate(labels) if label.upper() != "TTM"][::-1]
+        row = panel.index[ticker]
+        for field, metric in DERIVED_FIELDS.items():
+            expected = metrics[metric][annual[:panel.periods]]
+            actual = panel.columns[field][row, :len(expected)]
+            if not np.allclose(actual, expected, equal_nan=True):
+                print(f"MISMATCH {ticker} {field}: {actual} != {expected}")
+                failures += 1
+    return failures
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), max(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickers", type=int, default=3000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(18)
+    frames_by_ticker = {f"T{i:05d}": sample_frames(rng) for i in range(args.tickers)}
+    with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as fh:
+        fh.write("\n".join(frames_by_ticker))
+    try:
+        screener = Screener(universe_path=fh.name, store=None, read=frames_by_ticker.__getitem__)
+        start = time.perf_counter()
+        panel = screener.refresh()
+        build = time.perf_counter() - start
+    finally:
+        os.unlink(fh.name)
+    print(f"Built panel for {len(panel.tickers)} tickers in {build * 1000:.0f} ms "
+          f"({screener.stats()['bytes'] / 1e6:.1f} MB)")
+
+    failures = check_parity(panel, frames_by_ticker, list(frames_by_ticker)[:200])
+
+    print(f"{'query':<22} {'matches':>8} {'p50 ms':>8} {'max ms':>8}")
+    for where, order, label in QUERIES:
+        result = screener.screen(where, order, per_page=50)
+        p50, worst = timed(lambda: screener.screen(where, order, page=2, per_page=50), args.repeat)
+        print(f"{label:<22} {result['total']:>8} {p50:>8.2f} {worst:>8.2f}")
+
+    changed = list(frames_by_ticker)[::100]
+    for ticker in changed:
+        frames_by_ticker[ticker] = sample_frames(rng)
+        screener.mark_dirty(ticker, "financials")
+    start = time.perf_counter()
+    panel = screener.refresh()
+    incremental = time.perf_counter() - start
+    print(f"Incremental refresh of {len(changed)} tickers: {incremental * 1000:.1f} ms "
+          f"(full build {build * 1000:.0f} ms, x{build / incremental:.0f})")
+    failures += check_parity(panel, frames_by_ticker, changed)
+
+    if failures:
+        print(f"{failures} mismatches")
+        sys.exit(1)
+    print("Panel matches derive()")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Latency of ticker suggestions from the in-memory prefix index.
+
+Builds a SymbolIndex from a symbol file (--file, any format SYMBOLS_PATH
+takes) or from N synthetic symbols with three-word company names, then
+times suggest() for short and long ticker prefixes, one- and two-word name
+queries and a query that matches nothing. Every query should stay well under
+a millisecond.
+
+    python benchmarks/bench_suggest.py [--file nasdaqlisted.txt] [--symbols N]
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+os.environ.setdefault("STORE_PATH", "")
+os.environ.setdefault("SHARED_CACHE_PATH", "")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from symbols import SymbolIndex, read_symbol_file  # noqa: E402
+
+NAME_WORDS = ("apple micro soft amazon alpha meta platforms bank america general electric motors holdings group "
+              "capital energy international systems technologies pharmaceuticals").split()
+QUERIES = ["A", "AP", "APPL", "BRK", "apple", "bank of", "international sys", "zzzz"]
+
+
+def synthetic(count, rng):
+    names = {}
+    while len(names) < count:
+        ticker = "".join(rng.choices(string.ascii_uppercase, k=rng.randint(1, 5)))
+        names.setdefault(ticker, " ".join(rng.choices(NAME_WORDS, k=3)).title() + " Inc.")
+    return names
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--file")
+    parser.add_argument("--symbols", type=int, default=12000)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    names = read_symbol_file(args.file) if args.file else synthetic(args.symbols, random.Random(25))
+    start = time.perf_counter()
+    index = SymbolIndex(names)
+    print(f"Indexed {len(index)} symbols ({len(index.words)} name words) in "
+          f"{(time.perf_counter() - start) * 1000:.0f} ms")
+
+    print(f"{'query':<20} {'matches':>8} {'us/query':>9}")
+    for query in QUERIES:
+        matches = len(index.suggest(query))
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            index.suggest(query)
+        print(f"{query:<20} {matches:>8} {(time.perf_counter() - start) / args.repeat * 1e6:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Parity check and benchmark: per-cell statement formatting vs the batched transform.
+
+Checks format_numbers() against the scalar format_number() on bucket
+boundaries and random values, checks transform_section() against the
+former per-metric to_dict/format_dict/chart_data loop, then times both over
+many synthetic tickers. Exits non-zero on any mismatch.
+
+    python benchmarks/bench_transform.py [--tickers N]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import metrics_sections  # noqa: E402
+from transform import format_number, format_numbers, sorted_years, transform_section  # noqa: E402
+
+
+def legacy_section(df, metrics):
+    # The per-cell implementation result() used before the batched transform
+    out = {}
+    for name, key in metrics.items():
+        years_str = [str(c.year) if hasattr(c, "year") else str(c) for c in df.columns]
+        if key in df.index:
+            row_vals = df.loc[key].where(pd.notnull(df.loc[key]), None).tolist()
+            out[name] = dict(zip(years_str, row_vals))
+        else:
+            out[name] = {y: None for y in years_str}
+    years = sorted_years(list(next(iter(out.values())).keys()))
+    formatted = {k: {y: format_number(v) for y, v in vals.items()} for k, vals in out.items()}
+
+    def chart_format(v):
+        if v is None or v == 0:
+            return None
+        try:
+            return round(float(v) / 1e6, 2)
+        except:
+            return None
+
+    charts = {k: [chart_format(out[k].get(y)) for y in years] for k in out}
+    return years, out, formatted, charts
+
+
+def sample_values(rng, count):
+    boundaries = np.array([0, 99.94, 99.95, 99.99, 100, 999.99, 1e3, 9999.9, 1e4, 99999.9, 1e5,
+                           999999.99, 1e6, 999999999.9, 1e9, 999999999999.9, 1e12, 1e15])
+    magnitudes = 10 ** rng.uniform(-2, 14, size=count)
+    values = np.concatenate([boundaries, -boundaries, magnitudes * rng.choice([-1, 1], size=count)])
+    values[rng.integers(0, len(values), size=count // 50)] = np.nan
+    return values
+
+
+def sample_frame(rng, metrics, num_years=5):
+    columns = [pd.Timestamp(f"{2024 - i}-12-31") for i in range(num_years)]
+    rows = list(metrics.values())[:-1] + ["Unused Line Item %d" % i for i in range(40)]
+    values = 10 ** rng.uniform(-1, 12, size=(len(rows), num_years)) * rng.choice([-1, 1], size=(len(rows), num_years))
+    values[rng.random(values.shape) < 0.05] = np.nan
+    return pd.DataFrame(values, index=rows, columns=columns)
+
+
+def is_missing(v):
+    return v is None or (isinstance(v, float) and np.isnan(v))
+
+
+def check_parity(rng):
+    values = sample_values(rng, 200_000)
+    expected = ["N/A" if np.isnan(v) else format_number(v) for v in values]
+    actual = format_numbers(values).tolist()
+    mismatches = [(v, e, a) for v, e, a in zip(values, expected, actual) if e != a]
+    for name, metrics in metrics_sections.items():
+        for _ in range(200):
+            df = sample_frame(rng, metrics, num_years=int(rng.integers(1, 6)))
+            years, raw, formatted, charts = legacy_section(df, metrics)
+            section = transform_section(df, metrics)
+            assert section["years"] == years, (section["years"], years)
+            for metric in metrics:
+                # On float rows the old where(notnull, None) left NaN in place, so missing
+                # cells rendered as "nan" and leaked NaN into JSON; the batched
+                # transform yields the intended None / "N/A" for them
+                old_raw = [None if is_missing(raw[metric][y]) else raw[metric][y] for y in years]
+                old_fmt = ["N/A" if is_missing(raw[metric][y]) else formatted[metric][y] for y in years]
+                if section["formatted"][metric] != old_fmt:
+                    mismatches.append((name, metric, "formatted"))
+                if section["raw"][metric] != old_raw:
+                    mismatches.append((name, metric, "raw"))
+                for new, old in zip(section["charts"][metric], charts[metric]):
+                    old = None if is_missing(old) else old
+                    # np.round and round() can differ in the last place on ties
+                    if (new is None) != (old is None) or (new is not None and abs(new - old) > 0.011):
+                        mismatches.append((name, metric, "charts", new, old))
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tickers", type=int, default=1000)
+    args = parser.parse_args()
+    rng = np.random.default_rng(7)
+
+    mismatches = check_parity(rng)
+    if mismatches:
+        for mismatch in mismatches[:20]:
+            print("MISMATCH", mismatch)
+        sys.exit(f"{len(mismatches)} parity mismatches")
+    print("parity: format_numbers and transform_section match the per-cell implementation")
+
+    frames = [{name: sample_frame(rng, metrics) for name, metrics in metrics_sections.items()}
+              for _ in range(args.tickers)]
+    timings = {}
+    for label, fn in (("per-cell", legacy_section), ("batched", transform_section)):
+        start = time.perf_counter()
+        for statements in frames:
+            for name, df in statements.items():
+                fn(df, metrics_sections[name])
+        timings[label] = time.perf_counter() - start
+        print(f"{label:<10} {args.tickers} tickers in {timings[label]:.3f}s "
+              f"({timings[label] / args.tickers * 1e6:.0f} us/ticker)")
+    print(f"speedup x{timings['per-cell'] / timings['batched']:.1f}")
+
+
+if __name__ == "__main__":
+    main()
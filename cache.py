@@ -0,0 +1,161 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import pandas as pd
+
+
+def estimate_size(value):
+    # Rough in-memory footprint used for the byte budget of the cache
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum()) if hasattr(usage, "sum") else int(usage)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class TTLCache:
+    """Thread-safe LRU cache with per-entry expiry, bounded by entry count and bytes."""
+
+    def __init__(self, max_entries=1024, max_bytes=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            expires_at, size, value, _ = entry
+            if expires_at <= time.monotonic():
+                # Expired entries stay until evicted so get_stale() can still serve them
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def get_stale(self, key):
+        # (value, stored_at) regardless of expiry, or None
+        with self._lock:
+            entry = self._data.get(key)
+            return None if entry is None else (entry[2], entry[3])
+
+    def ttl_remaining(self, key):
+        # Seconds until the entry expires, without touching LRU order or counters
+        with self._lock:
+            entry = self._data.get(key)
+            return None if entry is None else max(0.0, entry[0] - time.monotonic())
+
+    def set(self, key, value, ttl):
+        size = estimate_size(value)
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            self._data[key] = (time.monotonic() + ttl, size, value, time.time())
+            self.current_bytes += size
+            while self._data and (
+                len(self._data) > self.max_entries
+                or (self.max_bytes is not None and self.current_bytes > self.max_bytes)
+            ):
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key):
+        size = self._data.pop(key)[1]
+        self.current_bytes -= size
+
+    def keys(self):
+        with self._lock:
+            return list(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "bytes": self.current_bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "expirations": self.expirations,
+                "evictions": self.evictions,
+            }
+
+
+class SingleFlight:
+    """Coalesces concurrent calls for the same key onto one in-flight future."""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.originated = 0
+        self.coalesced = 0
+
+    def submit(self, key, executor, fn, *args):
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future
+            future = executor.submit(fn, *args)
+            self._calls[key] = future
+            self.originated += 1
+        future.add_done_callback(lambda f: self._forget(key, f))
+        return future
+
+    def do(self, key, fn, *args):
+        # Same as submit() but the originating caller runs fn in its own thread
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.coalesced += 1
+                owner = False
+            else:
+                future = Future()
+                self._calls[key] = future
+                self.originated += 1
+                owner = True
+        if owner:
+            try:
+                future.set_result(fn(*args))
+            except BaseException as exc:
+                future.set_exception(exc)
+            finally:
+                self._forget(key, future)
+        return future.result()
+
+    def _forget(self, key, future):
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "originated": self.originated,
+                "coalesced": self.coalesced,
+            }
@@ -0,0 +1,80 @@
+import threading
+import time
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a single half-open probe.
+
+    After failure_threshold failures in a row the circuit opens and calls are
+    rejected for reset_timeout seconds; then one probe call is let through and
+    its outcome closes or re-opens the circuit. before_call() says whether a
+    call is that probe; only the probe's success may close the circuit, not
+    a slow call that started before it opened.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.times_opened = 0
+        self.rejected = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        # True for the half-open probe; pass it on to record_success()/record_failure()
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+            if self.state == self.CLOSED:
+                return False
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self.rejected += 1
+        raise CircuitOpenError(f"{self.name} circuit is {self.state}")
+
+    def record_success(self, probe=False):
+        with self._lock:
+            if self.state != self.CLOSED and not probe:
+                return
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self._probing = False
+
+    def record_failure(self, probe=False):
+        with self._lock:
+            self.consecutive_failures += 1
+            if probe or (self.state == self.CLOSED and self.consecutive_failures >= self.failure_threshold):
+                if self.state != self.OPEN:
+                    self.times_opened += 1
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+            if probe:
+                self._probing = False
+
+    def retry_after(self):
+        # Seconds until the next probe may go through; 0 when the circuit is closed
+        with self._lock:
+            if self.state != self.OPEN:
+                return 0.0
+            return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "name": self.name,
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "times_opened": self.times_opened,
+                "rejected": self.rejected,
+            }
@@ -0,0 +1,146 @@
+import time
+import urllib.request
+from collections import Counter
+from concurrent.futures import as_completed
+
+import click
+from flask.cli import AppGroup
+
+import fundamentals
+import prefetch
+import symbols
+from providers import ReplayProvider, YFinanceProvider
+
+store_cli = AppGroup("store", help="Bulk-load and refresh the local fundamentals store.")
+
+
+def sync(tickers, force):
+    if fundamentals.store is None:
+        raise click.UsageError("The fundamentals store is disabled (STORE_PATH is empty).")
+    jobs = {
+        fundamentals.fetch_pool.submit(fundamentals.sync_dataset, ticker, dataset, force): (ticker, dataset)
+        for ticker in tickers
+        for dataset in fundamentals.DATASETS
+    }
+    counts = Counter()
+    with click.progressbar(length=len(jobs), label=f"Syncing {len(tickers)} tickers") as bar:
+        for future in as_completed(jobs):
+            ticker, dataset = jobs[future]
+            try:
+                counts[future.result()] += 1
+            except Exception as exc:
+                counts["failed"] += 1
+                click.echo(f"\n{ticker} {dataset}: {exc!r}", err=True)
+            bar.update(1)
+    click.echo(f"fetched {counts['fetched']}, up to date {counts['fresh']}, failed {counts['failed']}")
+
+
+@store_cli.command("load")
+@click.argument("tickers", nargs=-1)
+@click.option("--file", "universe", type=click.Path(exists=True, dir_okay=False),
+              help="Ticker universe file, one symbol per line.")
+@click.option("--force", is_flag=True, help="Re-download even if the stored copy is current.")
+def load(tickers, universe, force):
+    """Download info and statements for TICKERS and/or a universe file."""
+    tickers = [t.upper() for t in tickers] + (fundamentals.read_ticker_file(universe) if universe else [])
+    if not tickers:
+        raise click.UsageError("Pass tickers or --file.")
+    sync(list(dict.fromkeys(tickers)), force)
+
+
+@store_cli.command("refresh")
+@click.option("--force", is_flag=True, help="Re-download everything, not only what is due.")
+def refresh(force):
+    """Re-download the stored datasets whose newest period may have changed."""
+    sync(fundamentals.store.tickers() if fundamentals.store is not None else [], force)
+
+
+@store_cli.command("stats")
+def stats():
+    """Show what the store holds."""
+    if fundamentals.store is None:
+        raise click.UsageError("The fundamentals store is disabled (STORE_PATH is empty).")
+    for key, value in fundamentals.store.stats().items():
+        click.echo(f"{key}: {value}")
+
+
+fixtures_cli = AppGroup("fixtures", help="Record upstream responses for the replay provider.")
+
+
+@fixtures_cli.command("record")
+@click.argument("tickers", nargs=-1)
+@click.option("--file", "universe", type=click.Path(exists=True, dir_okay=False),
+              help="Ticker universe file, one symbol per line.")
+@click.option("--dir", "root", default=fundamentals.PROVIDER_FIXTURES, show_default=True,
+              type=click.Path(file_okay=False), help="Fixture directory.")
+def record(tickers, universe, root):
+    """Save live Yahoo responses for TICKERS as replay fixtures."""
+    tickers = [t.upper() for t in tickers] + (fundamentals.read_ticker_file(universe) if universe else [])
+    if not tickers:
+        raise click.UsageError("Pass tickers or --file.")
+    recorder = ReplayProvider(root, upstream=YFinanceProvider(), record=True)
+    jobs = {
+        fundamentals.fetch_pool.submit(recorder.fetch, ticker, dataset): (ticker, dataset)
+        for ticker in dict.fromkeys(tickers)
+        for dataset in fundamentals.DATASETS
+    }
+    failed = 0
+    with click.progressbar(length=len(jobs), label=f"Recording {len(tickers)} tickers") as bar:
+        for future in as_completed(jobs):
+            ticker, dataset = jobs[future]
+            if future.exception() is not None:
+                failed += 1
+                click.echo(f"\n{ticker} {dataset}: {future.exception()!r}", err=True)
+            bar.update(1)
+    click.echo(f"recorded {recorder.recorded}, failed {failed} into {root}")
+
+
+@click.command("prefetch")
+@click.option("--watchlist", default=prefetch.PREFETCH_WATCHLIST, show_default=True,
+              type=click.Path(exists=True, dir_okay=False), help="Tickers to keep warm, one per line.")
+def prefetch_command(watchlist):
+    """Run the watchlist warmer in the foreground as its own worker."""
+    if not watchlist:
+        raise click.UsageError("Pass --watchlist or set PREFETCH_WATCHLIST.")
+    warmer = prefetch.start(watchlist)
+    if warmer is None:
+        raise click.ClickException("Another process on this host is already running the warmer.")
+    try:
+        while True:
+            time.sleep(60)
+            stats = warmer.stats()
+            click.echo(f"scheduled {stats['scheduled']}, queue depth {stats['queue_depth']}, "
+                       f"refreshes {stats['refreshes']}, failures {stats['failures']}")
+    except KeyboardInterrupt:
+        warmer.stop()
+
+
+symbols_cli = AppGroup("symbols", help="Maintain the symbol list behind ticker suggestions and checks.")
+
+# Every Nasdaq-listed symbol, and NYSE, NYSE American, Arca and Cboe listings
+NASDAQ_SYMBOL_DIRECTORIES = (
+    "https://www.nasdaqtrader.com/dynamic/SymDir/nasdaqlisted.txt",
+    "https://www.nasdaqtrader.com/dynamic/SymDir/otherlisted.txt",
+)
+
+
+@symbols_cli.command("fetch")
+@click.option("--url", "urls", multiple=True,
+              help="Symbol directory to read (repeatable); defaults to Nasdaq Trader's.")
+@click.option("--out", default=symbols.SYMBOLS_PATH, show_default=True, type=click.Path(dir_okay=False),
+              help="Symbol list to write; running workers pick it up within SYMBOLS_RECHECK seconds.")
+def fetch_symbols(urls, out):
+    """Download the US symbol directories into the symbol list."""
+    if not out:
+        raise click.UsageError("Pass --out or set SYMBOLS_PATH.")
+    names = {}
+    for url in urls or NASDAQ_SYMBOL_DIRECTORIES:
+        with urllib.request.urlopen(url, timeout=30) as response:
+            found = symbols.symbol_directory(response.read().decode("utf-8", "replace"))
+        click.echo(f"{url}: {len(found)} symbols")
+        for ticker, name in found.items():
+            names.setdefault(ticker, name)
+    if not names:
+        raise click.ClickException("No symbols found; the existing list was left alone.")
+    symbols.write_symbol_file(out, names)
+    click.echo(f"wrote {len(names)} symbols to {out}")
@@ -0,0 +1,187 @@
+import os
+
+import numpy as np
+
+import records
+from cache import TTLCache
+from transform import chart_values, extract_metrics, format_numbers, sorted_years
+
+DERIVED_TTL = int(os.environ.get("DERIVED_TTL", os.environ.get("STATEMENT_TTL", 86400)))
+DERIVED_CACHE_ENTRIES = int(os.environ.get("DERIVED_CACHE_ENTRIES", 2048))
+
+STATEMENTS = ("financials", "balance_sheet", "cashflow")
+
+# Statement line items the ratios are built from: input -> (dataset, row names in order of preference)
+INPUTS = {
+    "revenue": ("financials", ("Total Revenue", "Operating Revenue")),
+    "gross_profit": ("financials", ("Gross Profit",)),
+    "operating_income": ("financials", ("Operating Income",)),
+    "net_income": ("financials", ("Net Income", "Net Income Common Stockholders")),
+    "ebitda": ("financials", ("EBITDA", "Normalized EBITDA")),
+    "net_debt": ("balance_sheet", ("Net Debt",)),
+    "total_debt": ("balance_sheet", ("Total Debt",)),
+    "cash": ("balance_sheet", ("Cash And Cash Equivalents", "Cash Cash Equivalents And Short Term Investments")),
+    "free_cash_flow": ("cashflow", ("Free Cash Flow",)),
+    "operating_cash_flow": ("cashflow", ("Operating Cash Flow",)),
+    "capital_expenditure": ("cashflow", ("Capital Expenditure",)),
+}
+# The rows above stay in the compact cached statements
+records.keep(records.STATEMENT, (row for _, rows in INPUTS.values() for row in rows))
+
+# Output rows in display order and how each is formatted (see DERIVED_UNITS)
+DERIVED_METRICS = {
+    "Gross Margin": "pct",
+    "Operating Margin": "pct",
+    "Net Margin": "pct",
+    "Revenue Growth (YoY)": "pct",
+    "Net Income Growth (YoY)": "pct",
+    "Revenue CAGR (3Y)": "pct",
+    "Net Debt / EBITDA": "ratio",
+    "Free Cash Flow": "money",
+}
+
+DERIVED_UNITS = {"pct": "%", "ratio": "x", "money": "Mn"}
+
+derived_cache = TTLCache(max_entries=DERIVED_CACHE_ENTRIES)
+
+
+def divide(numerator, denominator, positive=False):
+    # Element-wise ratio, NaN where the denominator is 0, missing, or (with positive) not above 0
+    valid = (denominator > 0) if positive else (denominator != 0)
+    valid &= ~np.isnan(numerator) & ~np.isnan(denominator)
+    return np.divide(numerator, denominator, out=np.full(np.broadcast(numerator, denominator).shape, np.nan),
+                     where=valid)
+
+
+def growth(values, annual, lag=1):
+    # (x_t / x_{t-lag}) ** (1 / lag) - 1 along the last axis, over annual columns only.
+    # Undefined for non-positive bases; TTM columns are left out.
+    out = np.full(values.shape, np.nan)
+    if values.shape[-1] > lag:
+        current, base = values[..., lag:], values[..., :-lag]
+        ratio = divide(current, base, positive=True)
+        if lag > 1:
+            # No real root for a sign change, so compound rates need both ends positive
+            ratio[ratio <= 0] = np.nan
+            ratio **= 1.0 / lag
+        out[..., lag:] = ratio - 1
+    out[..., ~annual] = np.nan
+    return out
+
+
+def compute(inputs, annual):
+    """Derived metrics from aligned input arrays of shape (..., years).
+
+    Leading axes are free, so one call covers a single ticker (years,) or a
+    whole universe (tickers, years). Missing inputs and undefined ratios are NaN.
+    """
+    revenue = inputs["revenue"]
+    net_debt = np.where(np.isnan(inputs["net_debt"]), inputs["total_debt"] - inputs["cash"], inputs["net_debt"])
+    free_cash_flow = np.where(np.isnan(inputs["free_cash_flow"]),
+                              inputs["operating_cash_flow"] + inputs["capital_expenditure"], inputs["free_cash_flow"])
+    return {
+        "Gross Margin": divide(inputs["gross_profit"], revenue, positive=True) * 100,
+        "Operating Margin": divide(inputs["operating_income"], revenue, positive=True) * 100,
+        "Net Margin": divide(inputs["net_income"], revenue, positive=True) * 100,
+        "Revenue Growth (YoY)": growth(revenue, annual) * 100,
+        "Net Income Growth (YoY)": growth(inputs["net_income"], annual) * 100,
+        "Revenue CAGR (3Y)": growth(revenue, annual, lag=3) * 100,
+        "Net Debt / EBITDA": divide(net_debt, inputs["ebitda"], positive=True),
+        "Free Cash Flow": free_cash_flow,
+    }
+
+
+def extract_inputs(frames):
+    # {input: {year label: value}} for one ticker, picking the first row name present
+    found = {}
+    for dataset in STATEMENTS:
+        df = frames.get(dataset)
+        if df is None or df.empty:
+            continue
+        rows = [row for name, (source, candidates) in INPUTS.items() if source == dataset for row in candidates]
+        years, values = extract_metrics(df, dict(zip(rows, rows)))
+        by_row = dict(zip(rows, values))
+        for name, (source, candidates) in INPUTS.items():
+            if source != dataset:
+                continue
+            merged = np.full(len(years), np.nan)
+            for row in candidates:
+                merged = np.where(np.isnan(merged), by_row[row], merged)
+            found[name] = dict(zip(years, merged))
+    return found
+
+
+def align(extracted, labels):
+    # Stack per-ticker inputs onto one shared year axis: {input: (tickers, years)}
+    index = {label: i for i, label in enumerate(labels)}
+    inputs = {name: np.full((len(extracted), len(labels)), np.nan) for name in INPUTS}
+    for row, found in enumerate(extracted):
+        for name, by_year in found.items():
+            for label, value in by_year.items():
+                inputs[name][row, index[label]] = value
+    return inputs
+
+
+def build_inputs(frames_by_ticker):
+    # (tickers, labels, annual mask, {input: (tickers, years)}) on the sorted union
+    # of every ticker's fiscal years (TTM last)
+    tickers = list(frames_by_ticker)
+    extracted = [extract_inputs(frames_by_ticker[ticker]) for ticker in tickers]
+    labels = sorted_years(list({label for found in extracted for by_year in found.values() for label in by_year}))
+    annual = np.array([label.upper() != "TTM" for label in labels], dtype=bool)
+    return tickers, labels, annual, align(extracted, labels)
+
+
+def derive_panel(frames_by_ticker):
+    """Derived metrics for many tickers in one vectorized pass.
+
+    Returns (tickers, labels, {metric: array of shape (tickers, years)}).
+    """
+    tickers, labels, annual, inputs = build_inputs(frames_by_ticker)
+    return tickers, labels, compute(inputs, annual)
+
+
+def derive(frames):
+    # (labels, {metric: array over labels}) for one ticker
+    _, labels, metrics = derive_panel({None: frames})
+    return labels, {name: values[0] for name, values in metrics.items()}
+
+
+def cached_derive(ticker, frames):
+    # Reused for as long as the statement frames it was computed from are the cached ones.
+    # Holding the frames keeps the cached records handing out these same objects.
+    inputs = tuple(frames.get(dataset) for dataset in STATEMENTS)
+    entry = derived_cache.get(ticker)
+    if entry is not None and all(held is frame for held, frame in zip(entry[0], inputs)):
+        return entry[1]
+    result = derive(frames)
+    derived_cache.set(ticker, (inputs, result), DERIVED_TTL)
+    return result
+
+
+def format_derived(kind, values):
+    if kind == "money":
+        return format_numbers(values)
+    out = np.full(values.shape, "N/A", dtype=object)
+    present = ~np.isnan(values)
+    out[present] = list(map(("{:.1f}%" if kind == "pct" else "{:.2f}x").format, values[present]))
+    return out
+
+
+def derived_section(labels, metrics, years):
+    """Section dict for the newest `years` fiscal years (plus TTM), shaped like transform_section()."""
+    annual = [i for i, label in enumerate(labels) if label.upper() != "TTM"]
+    keep = annual[-years:] + [i for i, label in enumerate(labels) if label.upper() == "TTM"]
+    raw, formatted, charts = {}, {}, {}
+    for name, kind in DERIVED_METRICS.items():
+        values = metrics[name][keep]
+        raw[name] = np.where(np.isnan(values), None, values).tolist()
+        formatted[name] = format_derived(kind, values).tolist()
+        charts[name] = (chart_values(values) if kind == "money"
+                        else np.where(np.isnan(values), None, np.round(values, 2))).tolist()
+    return {
+        "years": [labels[i] for i in keep],
+        "raw": raw,
+        "formatted": formatted,
+        "charts": charts,
+    }
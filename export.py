@@ -0,0 +1,118 @@
+import csv
+import io
+import logging
+import os
+
+import fundamentals
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet and Arrow exports are optional
+    pa = pq = None
+
+logger = logging.getLogger(__name__)
+
+EXPORT_MAX_TICKERS = int(os.environ.get("EXPORT_MAX_TICKERS", 5000))
+# Tickers fetched, converted and written per chunk (one Parquet row group);
+# memory is bounded by this, not by the number of tickers requested
+EXPORT_BATCH = int(os.environ.get("EXPORT_BATCH", 32))
+EXPORT_TIMEOUT = float(os.environ.get("EXPORT_TIMEOUT", 60))
+
+# Long format: one row per ticker, statement, metric and period
+COLUMNS = ("ticker", "section", "metric", "period", "value")
+
+FORMATS = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+
+def available(fmt):
+    return fmt == "csv" or (fmt in FORMATS and pa is not None)
+
+
+def iter_batches(tickers, datasets, rows, batch_size=EXPORT_BATCH, timeout=EXPORT_TIMEOUT):
+    """Columnar batches ({column: list}) for batch_size tickers at a time.
+
+    Each batch goes through iter_datasets, so cached datasets are reused and
+    misses are fetched in parallel; rows(ticker, data) turns one ticker's
+    datasets into columns. Tickers keep their requested order.
+    """
+    for start in range(0, len(tickers), batch_size):
+        chunk = tickers[start:start + batch_size]
+        by_ticker = {}
+        for ticker, data, errors, _ in fundamentals.iter_datasets(chunk, datasets, timeout):
+            if errors:
+                logger.warning("Exporting %s without %s", ticker, ", ".join(sorted(errors)))
+            by_ticker[ticker] = rows(ticker, data)
+        batch = {name: [] for name in COLUMNS}
+        for ticker in chunk:
+            for name, values in by_ticker[ticker].items():
+                batch[name].extend(values)
+        yield batch
+
+
+def csv_stream(batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    yield buffer.getvalue()
+    for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(zip(*(batch[name] for name in COLUMNS)))
+        yield buffer.getvalue()
+
+
+class ChunkSink:
+    """Write-only file object that hands back whatever was written since the last drain()."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def arrow_schema():
+    return pa.schema([(name, pa.string()) for name in COLUMNS[:-1]] + [("value", pa.float64())])
+
+
+def table_stream(batches, fmt):
+    # Parquet writes each batch as a row group, Arrow as a record batch; the
+    # bytes are passed on as soon as the writer produces them
+    schema = arrow_schema()
+    sink = ChunkSink()
+    writer = pq.ParquetWriter(sink, schema) if fmt == "parquet" else pa.ipc.new_stream(sink, schema)
+    try:
+        for batch in batches:
+            if batch["ticker"]:
+                writer.write_table(pa.Table.from_pydict(batch, schema=schema))
+                yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def stream(fmt, batches):
+    return csv_stream(batches) if fmt == "csv" else table_stream(batches, fmt)
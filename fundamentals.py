@@ -0,0 +1,366 @@
+import asyncio
+import logging
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError, as_completed
+
+import pandas as pd
+
+from cache import SingleFlight, TTLCache
+from circuit import CircuitBreaker, CircuitOpenError
+from metrics import upstream_errors_total, upstream_seconds
+from providers import load_provider
+from records import compact, expand, stats as record_stats
+from shared_cache import SharedCache
+from store import FundamentalsStore
+
+# Cache configuration (seconds / entries / bytes), overridable from the environment
+INFO_TTL = int(os.environ.get("INFO_TTL", 3600))
+STATEMENT_TTL = int(os.environ.get("STATEMENT_TTL", 86400))
+HISTORY_TTL = int(os.environ.get("HISTORY_TTL", 3600))
+EMPTY_TTL = int(os.environ.get("EMPTY_TTL", 300))
+# Entries are (ticker, dataset) pairs: room for 10k tickers of info plus statements,
+# so the byte budget is what normally bounds the cache
+CACHE_MAX_ENTRIES = int(os.environ.get("CACHE_MAX_ENTRIES", 50000))
+CACHE_MAX_BYTES = int(os.environ.get("CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+# Upstream fetch stage: shared bounded pool and hard per-call deadline (seconds).
+# Past the deadline the last good copy is served and the fetch finishes in the background.
+FETCH_WORKERS = int(os.environ.get("FETCH_WORKERS", 16))
+FETCH_TIMEOUT = float(os.environ.get("FETCH_TIMEOUT", 5))
+# Circuit breaker: consecutive failed or over-deadline calls before opening, seconds before a probe
+BREAKER_FAILURES = int(os.environ.get("BREAKER_FAILURES", 5))
+BREAKER_RESET = float(os.environ.get("BREAKER_RESET", 30))
+# Maximum simultaneous calls against Yahoo across all requests in this process
+UPSTREAM_CONCURRENCY = int(os.environ.get("UPSTREAM_CONCURRENCY", 8))
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+# Persistent store read through by load_dataset(); an empty STORE_PATH disables it
+STORE_PATH = os.environ.get("STORE_PATH", os.path.join(DATA_DIR, "fundamentals.sqlite3"))
+STORE_RECHECK_INTERVAL = int(os.environ.get("STORE_RECHECK_INTERVAL", 86400))
+STORE_MAX_AGE = int(os.environ.get("STORE_MAX_AGE", 90 * 86400))
+
+# Cache shared by all worker processes on the host; an empty SHARED_CACHE_PATH disables it
+SHARED_CACHE_PATH = os.environ.get("SHARED_CACHE_PATH", os.path.join(DATA_DIR, "shared_cache.sqlite3"))
+SHARED_CACHE_MAX_ENTRIES = int(os.environ.get("SHARED_CACHE_MAX_ENTRIES", 20000))
+
+# Where upstream data comes from: yahoo, replay, record, replay+record or module:attr.
+# Replay serves fixtures from PROVIDER_FIXTURES with PROVIDER_LATENCY (+ up to
+# PROVIDER_JITTER) seconds per fetch, for repeatable offline benchmarks.
+DATA_PROVIDER = os.environ.get("DATA_PROVIDER", "yahoo")
+PROVIDER_FIXTURES = os.environ.get("PROVIDER_FIXTURES", os.path.join(DATA_DIR, "fixtures"))
+PROVIDER_LATENCY = float(os.environ.get("PROVIDER_LATENCY", 0))
+PROVIDER_JITTER = float(os.environ.get("PROVIDER_JITTER", 0))
+
+STATEMENTS = ("financials", "balance_sheet", "cashflow")
+DATASETS = ("info",) + STATEMENTS
+# Fetched only for the page sections that show them, never prefetched or bulk-synced
+QUARTERLY_STATEMENTS = tuple("quarterly_" + statement for statement in STATEMENTS)
+HISTORY = "history"
+
+logger = logging.getLogger(__name__)
+
+provider = load_provider(DATA_PROVIDER, PROVIDER_FIXTURES, latency=PROVIDER_LATENCY, jitter=PROVIDER_JITTER)
+fundamentals_cache = TTLCache(max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES)
+fetch_pool = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="yf-fetch")
+# Concurrent lookups of the same (ticker, dataset) share one upstream fetch
+inflight = SingleFlight()
+upstream_slots = threading.BoundedSemaphore(UPSTREAM_CONCURRENCY)
+upstream_breaker = CircuitBreaker(provider.name, failure_threshold=BREAKER_FAILURES, reset_timeout=BREAKER_RESET)
+store = FundamentalsStore(STORE_PATH, info_max_age=INFO_TTL, recheck_interval=STORE_RECHECK_INTERVAL,
+                          max_age=STORE_MAX_AGE, history_max_age=HISTORY_TTL) if STORE_PATH else None
+shared_cache = SharedCache(SHARED_CACHE_PATH, max_entries=SHARED_CACHE_MAX_ENTRIES) if SHARED_CACHE_PATH else None
+# Called with (ticker, dataset) whenever a dataset is loaded into the cache
+update_listeners = []
+
+
+def empty_dataset(dataset):
+    return {} if dataset == "info" else pd.DataFrame()
+
+
+def dataset_ttl(dataset, value):
+    # Empty answers (unknown ticker, upstream hiccup) are kept only briefly
+    if value is None or len(value) == 0:
+        return EMPTY_TTL
+    if dataset == "info":
+        return INFO_TTL
+    return HISTORY_TTL if dataset == HISTORY else STATEMENT_TTL
+
+
+def lookup(ticker, dataset):
+    # Worker-local cache first, then the cache shared with the other workers.
+    # Both hold compact records; callers get the DataFrame or dict back.
+    value = fundamentals_cache.get((ticker, dataset))
+    if value is None and shared_cache is not None:
+        entry = shared_cache.get(f"{dataset}:{ticker}")
+        if entry is not None:
+            value, expires_at = entry
+            fundamentals_cache.set((ticker, dataset), value, expires_at - time.time())
+    return expand(value)
+
+
+def ttl_remaining(ticker, dataset):
+    remaining = fundamentals_cache.ttl_remaining((ticker, dataset))
+    if not remaining and shared_cache is not None:
+        remaining = shared_cache.ttl_remaining(f"{dataset}:{ticker}")
+    return remaining
+
+
+def cached_at(ticker, dataset):
+    # When this worker cached its copy of the dataset (epoch seconds), or None
+    entry = fundamentals_cache.get_stale((ticker, dataset))
+    return None if entry is None else entry[1]
+
+
+def remember(ticker, dataset, value, ttl):
+    record = compact(dataset, value)
+    fundamentals_cache.set((ticker, dataset), record, ttl)
+    if shared_cache is not None:
+        shared_cache.set(f"{dataset}:{ticker}", record, ttl)
+    for listener in update_listeners:
+        listener(ticker, dataset)
+    return record
+
+
+def fetch_dataset(ticker, dataset):
+    with upstream_slots:
+        try:
+            probe = upstream_breaker.before_call()
+        except CircuitOpenError:
+            upstream_errors_total.inc(dataset=dataset, reason="circuit_open")
+            raise
+        start = time.monotonic()
+        try:
+            value = provider.fetch(ticker, dataset)
+        except Exception:
+            upstream_breaker.record_failure(probe)
+            upstream_errors_total.inc(dataset=dataset, reason="error")
+            raise
+        finally:
+            elapsed = time.monotonic() - start
+            upstream_seconds.observe(elapsed, dataset=dataset)
+    # A call that blew the deadline counts against the upstream even if it succeeded
+    if elapsed > FETCH_TIMEOUT:
+        upstream_breaker.record_failure(probe)
+        upstream_errors_total.inc(dataset=dataset, reason="slow")
+    else:
+        upstream_breaker.record_success(probe)
+    return value
+
+
+def refresh_dataset(ticker, dataset):
+    value = fetch_dataset(ticker, dataset)
+    if value is None:
+        value = empty_dataset(dataset)
+    # Empty answers are only cached for EMPTY_TTL; persisting them would serve
+    # them as fresh for as long as a real copy (and replace the last good one)
+    if store is not None and len(value):
+        store.write(ticker, dataset, value)
+    return value
+
+
+def needs_upstream(ticker, dataset):
+    # Statements whose newest fiscal period cannot have changed are served
+    # from the store; info always goes upstream when refreshed
+    return dataset == "info" or store is None or store.due(ticker, dataset)
+
+
+def prefetch_dataset(ticker, dataset):
+    # load_dataset() that refreshes info ahead of expiry. It runs under the
+    # same single-flight keys as request fetches, so it returns what they
+    # return: the dataset, in its cached form.
+    if needs_upstream(ticker, dataset):
+        value = refresh_dataset(ticker, dataset)
+    else:
+        value = store.read(ticker, dataset).value
+    return expand(remember(ticker, dataset, value, dataset_ttl(dataset, value)))
+
+
+def read_ticker_file(path):
+    # One ticker per line; blank lines and '#' comments are ignored
+    tickers = []
+    with open(path) as fh:
+        for line in fh:
+            ticker = line.split("#", 1)[0].strip().upper()
+            if ticker and ticker not in tickers:
+                tickers.append(ticker)
+    return tickers
+
+
+def sync_dataset(ticker, dataset, force=False):
+    if not force and store is not None and not store.due(ticker, dataset):
+        return "fresh"
+    refresh_dataset(ticker, dataset)
+    return "fetched"
+
+
+def load_dataset(ticker, dataset):
+    # Read through the persistent store; upstream is only hit when the stored
+    # copy is missing or due
+    stored = store.read(ticker, dataset) if store is not None else None
+    if stored is not None and stored.fresh:
+        value = stored.value
+    else:
+        value = refresh_dataset(ticker, dataset)
+    # Callers get the cached form too, so the full upstream copy is not kept alive
+    return expand(remember(ticker, dataset, value, dataset_ttl(dataset, value)))
+
+
+def last_good(ticker, dataset):
+    # Most recent copy regardless of expiry, with its age in seconds
+    entry = fundamentals_cache.get_stale((ticker, dataset))
+    if entry is not None:
+        return expand(entry[0]), time.time() - entry[1]
+    stored = store.read(ticker, dataset) if store is not None else None
+    if stored is not None:
+        return stored.value, time.time() - stored.fetched_at
+    return None
+
+
+def get_datasets(ticker, datasets=DATASETS, timeout=FETCH_TIMEOUT, timings=None):
+    # Cache hits are answered inline; misses are fetched concurrently on the
+    # shared pool. A dataset that fails, misses the deadline or hits an open
+    # circuit falls back to its last good copy (age in seconds in stale), or
+    # comes back empty and is reported in errors so only its section degrades.
+    # timings, if given, receives the seconds waited on each cache miss.
+    waits = {} if timings is not None else None
+    _, results, errors, stale = next(iter_datasets([ticker], datasets, timeout, waits))
+    if timings is not None:
+        timings.update((dataset, seconds) for (_, dataset), seconds in waits.items())
+    return results, errors, stale
+
+
+def iter_datasets(tickers, datasets=DATASETS, timeout=FETCH_TIMEOUT, timings=None):
+    # Yields (ticker, results, errors, stale) for every ticker as soon as all
+    # of its datasets are in, so batch callers can stream in completion order.
+    # timings, if given, receives {(ticker, dataset): seconds waited} for misses.
+    results = {ticker: {} for ticker in tickers}
+    errors = {ticker: {} for ticker in tickers}
+    stale = {ticker: {} for ticker in tickers}
+    remaining = dict.fromkeys(tickers, len(datasets))
+    pairs = [(ticker, dataset) for ticker in results for dataset in datasets]
+    for ticker, dataset, value, error, age in iter_dataset_results(pairs, timeout, timings):
+        results[ticker][dataset] = value
+        if error is not None:
+            errors[ticker][dataset] = error
+        if age is not None:
+            stale[ticker][dataset] = age
+        remaining[ticker] -= 1
+        if remaining[ticker] == 0:
+            yield ticker, results[ticker], errors[ticker], stale[ticker]
+
+
+def iter_dataset_results(pairs, timeout=FETCH_TIMEOUT, timings=None):
+    # Yields (ticker, dataset, value, error, stale_age) for each pair: cache
+    # hits first, then fetches in completion order. A failed, late or
+    # circuit-broken fetch yields its last good copy with its age in seconds,
+    # or an empty dataset with the error.
+    started = time.perf_counter()
+    hits = []
+    pending = {}
+    for ticker, dataset in pairs:
+        value = lookup(ticker, dataset)
+        if value is not None:
+            hits.append((ticker, dataset, value, None, None))
+        else:
+            future = inflight.submit((ticker, dataset), fetch_pool, load_dataset, ticker, dataset)
+            pending[future] = (ticker, dataset)
+    yield from hits
+
+    def resolve(future, ticker, dataset):
+        if timings is not None:
+            timings[(ticker, dataset)] = time.perf_counter() - started
+        return resolve_fetch(future, ticker, dataset, timeout)
+
+    try:
+        for future in as_completed(pending, timeout=timeout):
+            yield resolve(future, *pending.pop(future))
+    except FuturesTimeoutError:
+        for future, (ticker, dataset) in list(pending.items()):
+            yield resolve(future, ticker, dataset)
+
+
+def resolve_fetch(future, ticker, dataset, timeout):
+    # (ticker, dataset, value, error, stale_age) for a fetch that finished or hit its deadline
+    error = None
+    if not future.done():
+        error = "timeout"
+        upstream_errors_total.inc(dataset=dataset, reason="timeout")
+        logger.warning("Timed out fetching %s for %s after %ss", dataset, ticker, timeout)
+    elif future.exception() is not None:
+        exc = future.exception()
+        error = str(exc) or type(exc).__name__
+        if not isinstance(exc, CircuitOpenError):
+            logger.warning("Failed fetching %s for %s: %r", dataset, ticker, exc)
+    if error is None:
+        return ticker, dataset, future.result(), None, None
+    fallback = last_good(ticker, dataset)
+    if fallback is not None:
+        return ticker, dataset, fallback[0], None, int(fallback[1])
+    return ticker, dataset, empty_dataset(dataset), error, None
+
+
+async def get_datasets_async(ticker, datasets=DATASETS, timeout=FETCH_TIMEOUT, timings=None):
+    # get_datasets() for the event loop: misses still run on the bounded fetch
+    # pool (yfinance is blocking), but the caller awaits their futures instead
+    # of holding a thread, so one worker can wait on hundreds of lookups.
+    # Cache and store reads (SQLite, with its busy timeout) go to a thread too.
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    results, errors, stale = {}, {}, {}
+    pending = {}
+    cached = await asyncio.to_thread(lambda: {dataset: lookup(ticker, dataset) for dataset in datasets})
+    for dataset in datasets:
+        value = cached[dataset]
+        if value is not None:
+            results[dataset] = value
+        else:
+            future = inflight.submit((ticker, dataset), fetch_pool, load_dataset, ticker, dataset)
+            waiter = asyncio.wrap_future(future, loop=loop)
+            # Outcomes are read from the pool future; this keeps asyncio from
+            # logging unretrieved exceptions on the wrapper
+            waiter.add_done_callback(lambda f: f.cancelled() or f.exception())
+            pending[waiter] = (future, dataset)
+    waiting = set(pending)
+    while waiting:
+        done, waiting = await asyncio.wait(waiting, timeout=max(0.0, started + timeout - loop.time()),
+                                           return_when=asyncio.FIRST_COMPLETED)
+        if not done:
+            break
+        if timings is not None:
+            timings.update((pending[waiter][1], loop.time() - started) for waiter in done)
+    if timings is not None:
+        timings.update((pending[waiter][1], loop.time() - started) for waiter in waiting)
+    # Failed or late fetches fall back to the store
+    resolved = await asyncio.to_thread(lambda: [resolve_fetch(future, ticker, dataset, timeout)
+                                                for future, dataset in pending.values()]) if pending else []
+    for _, dataset, value, error, age in resolved:
+        results[dataset] = value
+        if error is not None:
+            errors[dataset] = error
+        if age is not None:
+            stale[dataset] = age
+    return {dataset: results[dataset] for dataset in datasets}, errors, stale
+
+
+def retry_after():
+    # When to try again after upstream failures left a request without data (seconds)
+    return math.ceil(upstream_breaker.retry_after()) or math.ceil(BREAKER_RESET)
+
+
+def cache_stats():
+    stats = fundamentals_cache.stats()
+    stats["tickers"] = len({ticker for ticker, _ in fundamentals_cache.keys()})
+    stats["bytes_per_ticker"] = stats["bytes"] // stats["tickers"] if stats["tickers"] else 0
+    stats["records"] = record_stats()
+    stats["singleflight"] = inflight.stats()
+    stats["breaker"] = upstream_breaker.stats()
+    stats["provider"] = provider.stats()
+    if shared_cache is not None:
+        stats["shared"] = shared_cache.stats()
+    if store is not None:
+        stats["store"] = store.stats()
+    return stats
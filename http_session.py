@@ -0,0 +1,116 @@
+import os
+import random
+import threading
+import time
+
+try:
+    from curl_cffi import requests as curl_requests
+    from curl_cffi.const import CurlInfo, CurlOpt
+except ImportError:  # older yfinance releases use requests and manage their own sessions
+    curl_requests = None
+
+# Idle connections each fetch thread keeps open (curl's connection cache per handle)
+HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", 8))
+# Seconds before TCP keep-alive probes start on an idle connection, and between probes
+HTTP_KEEPALIVE = int(os.environ.get("HTTP_KEEPALIVE", 60))
+# Retries after a transport error or a 502/503/504, with exponential backoff and jitter
+HTTP_RETRIES = int(os.environ.get("HTTP_RETRIES", 2))
+HTTP_BACKOFF = float(os.environ.get("HTTP_BACKOFF", 0.5))
+# CA bundle for certificate verification; empty uses the bundle curl_cffi ships with
+HTTP_CA_BUNDLE = os.environ.get("HTTP_CA_BUNDLE", "")
+
+RETRY_STATUSES = frozenset((502, 503, 504))
+
+_session = None
+_session_lock = threading.Lock()
+
+
+if curl_requests is not None:
+    class PooledSession(curl_requests.Session):
+        """curl_cffi session with retry and connection-reuse counters.
+
+        Each thread gets its own curl handle, so the connections it opened
+        (and their TLS sessions) stay alive between fetches instead of being
+        set up again per ticker. Every response reports how many new
+        connections it needed and how long the TLS handshake took; a warm
+        request shows zero of both.
+        """
+
+        def __init__(self, retries=HTTP_RETRIES, backoff=HTTP_BACKOFF, **kwargs):
+            super().__init__(curl_infos=[CurlInfo.NUM_CONNECTS, CurlInfo.CONNECT_TIME, CurlInfo.APPCONNECT_TIME],
+                             **kwargs)
+            self.retries = retries
+            self.backoff = backoff
+            self._stats_lock = threading.Lock()
+            self.requests = 0
+            self.reused = 0
+            self.connections = 0
+            self.handshake_seconds = 0.0
+            self.retried = 0
+            self.failed = 0
+
+        def record(self, response):
+            infos = response.infos
+            connects = infos.get(CurlInfo.NUM_CONNECTS, 0)
+            # APPCONNECT_TIME is 0 unless this transfer did a TLS handshake
+            handshake = max(0.0, infos.get(CurlInfo.APPCONNECT_TIME, 0.0) - infos.get(CurlInfo.CONNECT_TIME, 0.0))
+            with self._stats_lock:
+                self.requests += 1
+                self.reused += connects == 0
+                self.connections += connects
+                self.handshake_seconds += handshake
+
+        def count(self, name):
+            with self._stats_lock:
+                setattr(self, name, getattr(self, name) + 1)
+
+        def request(self, method, url, **kwargs):
+            attempt = 0
+            while True:
+                try:
+                    response = super().request(method, url, **kwargs)
+                except (curl_requests.exceptions.ConnectionError, curl_requests.exceptions.Timeout) as exc:
+                    # A certificate that fails verification will fail the same way again
+                    if attempt >= self.retries or isinstance(exc, curl_requests.exceptions.CertificateVerifyError):
+                        self.count("failed")
+                        raise
+                else:
+                    self.record(response)
+                    if response.status_code not in RETRY_STATUSES or attempt >= self.retries:
+                        return response
+                attempt += 1
+                self.count("retried")
+                time.sleep(self.backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+
+        def stats(self):
+            with self._stats_lock:
+                return {
+                    "pool_size": HTTP_POOL_SIZE,
+                    "requests": self.requests,
+                    "reused": self.reused,
+                    "reuse_ratio": round(self.reused / self.requests, 4) if self.requests else 0.0,
+                    "connections": self.connections,
+                    "handshake_seconds": round(self.handshake_seconds, 4),
+                    "retried": self.retried,
+                    "failed": self.failed,
+                }
+
+
+def pooled_session():
+    """The process-wide session every yfinance call goes through, or None without curl_cffi."""
+    global _session
+    if curl_requests is None:
+        return None
+    with _session_lock:
+        if _session is None:
+            _session = PooledSession(
+                impersonate="chrome",
+                verify=HTTP_CA_BUNDLE or True,
+                curl_options={
+                    CurlOpt.MAXCONNECTS: HTTP_POOL_SIZE,
+                    CurlOpt.TCP_KEEPALIVE: 1,
+                    CurlOpt.TCP_KEEPIDLE: HTTP_KEEPALIVE,
+                    CurlOpt.TCP_KEEPINTVL: HTTP_KEEPALIVE,
+                },
+            )
+        return _session
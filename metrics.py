@@ -0,0 +1,139 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency buckets in seconds, from sub-millisecond cache hits to upstream timeouts
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+registry = []
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def label_text(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in labels) + "}"
+
+
+def number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield f"{self.name}{label_text(zip(self.labelnames, key))} {number(value)}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram; observe() is a bisect and a locked increment."""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+        registry.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def collect(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            series = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._series.items())
+        for key, (counts, total, count) in series:
+            labels = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket{label_text(labels + [('le', number(bound))])} {cumulative}"
+            yield f"{self.name}_sum{label_text(labels)} {number(total)}"
+            yield f"{self.name}_count{label_text(labels)} {count}"
+
+
+def family(name, documentation, samples, kind="gauge"):
+    # Metric family read at scrape time from existing stats; samples is an
+    # iterable of (labels dict, value)
+    yield f"# HELP {name} {documentation}"
+    yield f"# TYPE {name} {kind}"
+    for labels, value in samples:
+        yield f"{name}{label_text(sorted(labels.items()))} {number(value)}"
+
+
+def exposition(*families):
+    lines = [line for metric in registry for line in metric.collect()]
+    lines += [line for family in families for line in family]
+    return "\n".join(lines) + "\n"
+
+
+stage_seconds = Histogram("dashboard_stage_seconds", "Time spent per request stage.", ["stage"])
+request_seconds = Histogram("dashboard_request_seconds", "Time to response headers per endpoint.", ["endpoint"])
+requests_total = Counter("dashboard_requests_total", "Responses by endpoint and status code.", ["endpoint", "status"])
+page_cache_total = Counter("dashboard_page_cache_total", "Rendered result page lookups.", ["result"])
+upstream_seconds = Histogram("dashboard_upstream_seconds", "Upstream fetch duration per dataset.", ["dataset"])
+upstream_errors_total = Counter("dashboard_upstream_errors_total", "Upstream failures per dataset and reason.",
+                                ["dataset", "reason"])
+
+
+class StageTimer:
+    """Per-request stage durations for the Server-Timing header and the stage histogram."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages = []
+
+    def record(self, name, seconds, desc=None):
+        self.stages.append((name, seconds, desc))
+        stage_seconds.observe(seconds, stage=name)
+
+    @contextmanager
+    def stage(self, name, desc=None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start, desc)
+
+    def header(self):
+        parts = []
+        for name, seconds, desc in self.stages + [("total", time.perf_counter() - self.start, None)]:
+            part = f"{name};dur={seconds * 1000:.1f}"
+            if desc:
+                part += f';desc="{desc}"'
+            parts.append(part)
+        return ", ".join(parts)
@@ -0,0 +1,218 @@
+import fcntl
+import heapq
+import logging
+import os
+import random
+import threading
+import time
+
+import fundamentals
+
+logger = logging.getLogger(__name__)
+
+# Watchlist of hot tickers kept warm ahead of expiry; unset disables the warmer
+PREFETCH_WATCHLIST = os.environ.get("PREFETCH_WATCHLIST", "")
+# Start the warmer inside the web app (one process per host wins the lock)
+PREFETCH_IN_APP = os.environ.get("PREFETCH_IN_APP", "0") == "1"
+# Refresh when this fraction of the TTL is left, +/- PREFETCH_JITTER of the TTL
+PREFETCH_LEAD = float(os.environ.get("PREFETCH_LEAD", 0.2))
+PREFETCH_JITTER = float(os.environ.get("PREFETCH_JITTER", 0.05))
+# Global upstream budget for the warmer (calls per second, burst)
+PREFETCH_RATE = float(os.environ.get("PREFETCH_RATE", 2))
+PREFETCH_BURST = int(os.environ.get("PREFETCH_BURST", 4))
+PREFETCH_RETRY = float(os.environ.get("PREFETCH_RETRY", 60))
+PREFETCH_LOCK_PATH = os.environ.get("PREFETCH_LOCK_PATH", os.path.join(fundamentals.DATA_DIR, "prefetch.lock"))
+
+STATUS_KEY = "prefetch:status"
+
+
+class RateLimiter:
+    """Token bucket: acquire() blocks until a token is available."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class Prefetcher:
+    """Keeps the watchlist's info and statements refreshed ahead of cache expiry."""
+
+    def __init__(self, watchlist_path, rate=PREFETCH_RATE, burst=PREFETCH_BURST,
+                 lead=PREFETCH_LEAD, jitter=PREFETCH_JITTER):
+        self.watchlist_path = watchlist_path
+        self.lead = lead
+        self.jitter = jitter
+        self.limiter = RateLimiter(rate, burst)
+        self._queue = []
+        self._scheduled = set()
+        self._watchlist_mtime = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        # Guards the queue and counters, which stats() reads from request threads
+        self._lock = threading.Lock()
+        self.last_refresh = {}
+        self.refreshes = 0
+        self.upstream_calls = 0
+        self.failures = 0
+
+    def schedule(self, ticker, dataset, due_at):
+        with self._lock:
+            heapq.heappush(self._queue, (due_at, ticker, dataset))
+            self._scheduled.add((ticker, dataset))
+
+    def next_due(self, ttl):
+        return time.time() + ttl * (1 - self.lead) + random.uniform(-self.jitter, self.jitter) * ttl
+
+    def load_watchlist(self):
+        try:
+            mtime = os.path.getmtime(self.watchlist_path)
+        except OSError as exc:
+            logger.warning("Cannot read prefetch watchlist %s: %r", self.watchlist_path, exc)
+            return
+        if mtime == self._watchlist_mtime:
+            return
+        self._watchlist_mtime = mtime
+        tickers = fundamentals.read_ticker_file(self.watchlist_path)
+        wanted = {(ticker, dataset) for ticker in tickers for dataset in fundamentals.DATASETS}
+        # Drop tickers that left the watchlist, schedule new ones from what is already cached
+        with self._lock:
+            self._queue = [item for item in self._queue if (item[1], item[2]) in wanted]
+            heapq.heapify(self._queue)
+            self._scheduled &= wanted
+        for ticker, dataset in sorted(wanted - self._scheduled):
+            remaining = fundamentals.ttl_remaining(ticker, dataset)
+            if remaining:
+                ttl = fundamentals.STATEMENT_TTL if dataset != "info" else fundamentals.INFO_TTL
+                due_at = time.time() + max(0.0, remaining - ttl * self.lead)
+            else:
+                due_at = time.time() + random.uniform(0, self.jitter * fundamentals.INFO_TTL)
+            self.schedule(ticker, dataset, due_at)
+        logger.info("Prefetch watchlist loaded: %d tickers", len(tickers))
+
+    def run_once(self):
+        with self._lock:
+            due_at, ticker, dataset = heapq.heappop(self._queue)
+        try:
+            if fundamentals.needs_upstream(ticker, dataset):
+                self.limiter.acquire()
+                with self._lock:
+                    self.upstream_calls += 1
+            value = fundamentals.inflight.do((ticker, dataset), fundamentals.prefetch_dataset, ticker, dataset)
+            ttl = fundamentals.dataset_ttl(dataset, value)
+        except Exception as exc:
+            logger.warning("Prefetch of %s for %s failed: %r", dataset, ticker, exc)
+            with self._lock:
+                self.failures += 1
+                heapq.heappush(self._queue, (time.time() + PREFETCH_RETRY, ticker, dataset))
+            return
+        with self._lock:
+            self.refreshes += 1
+            self.last_refresh.setdefault(ticker, {})[dataset] = time.time()
+            heapq.heappush(self._queue, (self.next_due(ttl), ticker, dataset))
+
+    def run(self):
+        last_status = 0
+        while not self._stop.is_set():
+            # Nothing that goes wrong in one pass may end the warmer for good
+            try:
+                self.load_watchlist()
+                if time.time() - last_status >= 5:
+                    self.publish_status()
+                    last_status = time.time()
+                if self._queue and self._queue[0][0] <= time.time():
+                    self.run_once()
+                    continue
+                delay = self._queue[0][0] - time.time() if self._queue else 30
+            except Exception:
+                logger.exception("Prefetch warmer pass failed")
+                delay = PREFETCH_RETRY
+            self._wake.wait(min(max(delay, 0), 5))
+            self._wake.clear()
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name="prefetch", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def stats(self):
+        now = time.time()
+        with self._lock:
+            queue = list(self._queue)
+            last_refresh = {ticker: dict(datasets) for ticker, datasets in self.last_refresh.items()}
+            refreshes, upstream_calls, failures = self.refreshes, self.upstream_calls, self.failures
+        return {
+            "watchlist": self.watchlist_path,
+            "pid": os.getpid(),
+            "scheduled": len(queue),
+            "queue_depth": sum(1 for due_at, _, _ in queue if due_at <= now),
+            "next_due_in": round(min(due_at for due_at, _, _ in queue) - now, 1) if queue else None,
+            "refreshes": refreshes,
+            "upstream_calls": upstream_calls,
+            "failures": failures,
+            "last_refresh": {ticker: {dataset: round(ts, 1) for dataset, ts in datasets.items()}
+                             for ticker, datasets in last_refresh.items()},
+            "updated_at": round(now, 1),
+        }
+
+    def publish_status(self):
+        # Lets every web worker report on a warmer running in another process
+        if fundamentals.shared_cache is not None:
+            fundamentals.shared_cache.set(STATUS_KEY, self.stats(), 60)
+
+
+def acquire_lock(path=PREFETCH_LOCK_PATH):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    handle = open(path, "w")
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return None
+    return handle
+
+
+prefetcher = None
+_lock_handle = None
+
+
+def start(watchlist_path=PREFETCH_WATCHLIST):
+    # Starts the warmer unless another process on this host already runs it
+    global prefetcher, _lock_handle
+    if prefetcher is not None or not watchlist_path:
+        return prefetcher
+    _lock_handle = acquire_lock()
+    if _lock_handle is None:
+        logger.info("Prefetch warmer already running in another process")
+        return None
+    prefetcher = Prefetcher(watchlist_path).start()
+    return prefetcher
+
+
+def status():
+    if prefetcher is not None:
+        return prefetcher.stats()
+    if fundamentals.shared_cache is not None:
+        entry = fundamentals.shared_cache.get(STATUS_KEY)
+        if entry is not None:
+            return entry[0]
+    return None
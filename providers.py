@@ -0,0 +1,163 @@
+import importlib
+import json
+import logging
+import os
+import pickle
+import random
+import tempfile
+import threading
+import time
+from urllib.parse import quote
+
+import pandas as pd
+import yfinance as yf
+
+from http_session import pooled_session
+
+logger = logging.getLogger(__name__)
+
+
+class YFinanceProvider:
+    """Live Yahoo Finance data through yfinance, over one shared pooled session."""
+
+    name = "yahoo"
+
+    def __init__(self, session=None):
+        self.session = session
+
+    def fetch(self, ticker, dataset):
+        handle = yf.Ticker(ticker, session=self.session)
+        if dataset == "history":
+            # Full daily history; callers cut it to the years they show
+            return handle.history(period="max", auto_adjust=True)
+        return getattr(handle, dataset)
+
+    def stats(self):
+        stats = {"name": self.name}
+        if self.session is not None:
+            stats["http"] = self.session.stats()
+        return stats
+
+
+class ReplayProvider:
+    """Serves datasets from fixture files, optionally recording them first.
+
+    Fixtures live under root/<ticker>/<dataset>.json (info) or .pkl (statement
+    frames). With an upstream provider and record=True every fetch goes
+    upstream and overwrites the fixture; with an upstream and record=False only
+    missing fixtures are recorded. Without an upstream a missing fixture reads
+    as an empty dataset, like an unknown ticker on Yahoo. Each replayed fetch
+    sleeps latency seconds plus up to jitter seconds to mimic the network.
+    """
+
+    def __init__(self, root, upstream=None, record=False, latency=0.0, jitter=0.0):
+        self.root = root
+        self.upstream = upstream
+        self.record = record
+        self.latency = latency
+        self.jitter = jitter
+        self.name = f"replay:{upstream.name}" if upstream is not None else "replay"
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+
+    def path(self, ticker, dataset):
+        # Tickers come from user input, so never let one name a directory outside root
+        name = quote(ticker, safe="")
+        if not name.strip("."):
+            raise ValueError(f"Invalid ticker {ticker!r}")
+        return os.path.join(self.root, name, dataset + (".json" if dataset == "info" else ".pkl"))
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def read(self, ticker, dataset):
+        path = self.path(ticker, dataset)
+        try:
+            if dataset == "info":
+                with open(path) as fh:
+                    return json.load(fh)
+            with open(path, "rb") as fh:
+                return pickle.load(fh)
+        except FileNotFoundError:
+            return None
+
+    def write(self, ticker, dataset, value):
+        path = self.path(ticker, dataset)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temp file and rename so a concurrent replay never reads a partial fixture
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            if dataset == "info":
+                with os.fdopen(fd, "w") as fh:
+                    json.dump(value, fh, default=str)
+            else:
+                with os.fdopen(fd, "wb") as fh:
+                    pickle.dump(value, fh, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        self._count("recorded")
+
+    def fetch(self, ticker, dataset):
+        if self.upstream is not None and self.record:
+            value = self.upstream.fetch(ticker, dataset)
+            self.write(ticker, dataset, value)
+            return value
+        value = self.read(ticker, dataset)
+        if value is None:
+            self._count("misses")
+            if self.upstream is None:
+                return {} if dataset == "info" else pd.DataFrame()
+            value = self.upstream.fetch(ticker, dataset)
+            self.write(ticker, dataset, value)
+            return value
+        self._count("hits")
+        delay = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay > 0:
+            time.sleep(delay)
+        return value
+
+    def tickers(self):
+        try:
+            return sorted(name for name in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, name)))
+        except FileNotFoundError:
+            return []
+
+    def stats(self):
+        with self._lock:
+            return {
+                "name": self.name,
+                "root": self.root,
+                "latency": self.latency,
+                "jitter": self.jitter,
+                "hits": self.hits,
+                "misses": self.misses,
+                "recorded": self.recorded,
+                **({"upstream": self.upstream.stats()} if self.upstream is not None else {}),
+            }
+
+
+def load_provider(spec, fixtures, latency=0.0, jitter=0.0):
+    """Build a provider from a DATA_PROVIDER spec.
+
+    "yahoo" is the live API; "replay" serves fixtures offline; "record" fetches
+    from Yahoo and saves every response as a fixture; "replay+record" replays
+    and records only what is missing. Anything of the form "module:attr" is
+    imported and called with no arguments, for providers kept outside this repo.
+    """
+    if ":" in spec:
+        module, attr = spec.split(":", 1)
+        return getattr(importlib.import_module(module), attr)()
+    if spec == "yahoo":
+        return YFinanceProvider(pooled_session())
+    if spec == "replay":
+        return ReplayProvider(fixtures, latency=latency, jitter=jitter)
+    if spec == "record":
+        return ReplayProvider(fixtures, upstream=YFinanceProvider(pooled_session()), record=True)
+    if spec == "replay+record":
+        return ReplayProvider(fixtures, upstream=YFinanceProvider(pooled_session()), latency=latency, jitter=jitter)
+    raise ValueError(f"Unknown DATA_PROVIDER {spec!r}")
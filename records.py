@@ -0,0 +1,194 @@
+import hashlib
+import json
+import sys
+import threading
+import weakref
+
+import numpy as np
+import pandas as pd
+
+from cache import estimate_size
+
+# What a cached dataset is cut down to, by kind of dataset
+INFO, STATEMENT, HISTORY = "info", "statement", "history"
+
+# Statement rows, price history columns and info keys that something reads;
+# "companyOfficers.name" keeps that key of every officer. Modules register
+# theirs at import; a kind nobody registered for keeps everything.
+kept = {INFO: set(), STATEMENT: set(), HISTORY: set()}
+
+# Distinct axes shared at most; past this, new ones stay with their record
+MAX_AXES = 4096
+# Info strings up to this length (sector, country, currency, ...) are interned
+MAX_INTERNED_STRING = 64
+
+_axes = {}
+_axes_lock = threading.Lock()
+
+
+def keep(kind, names):
+    kept[kind].update(names)
+
+
+def kind_of(dataset):
+    if dataset == "info":
+        return INFO
+    return HISTORY if dataset == "history" else STATEMENT
+
+
+def intern_axis(labels, build=pd.Index):
+    # One shared object per distinct period axis, row set or key tuple
+    key = (build, tuple(labels))
+    with _axes_lock:
+        axis = _axes.get(key)
+        if axis is None:
+            axis = build(key[1])
+            if len(_axes) < MAX_AXES:
+                _axes[key] = axis
+    return axis
+
+
+class FrameRecord:
+    """A statement or price frame as one read-only float64 block.
+
+    Statement rows and periods are interned, so a record costs its values
+    and little else. frame() builds a DataFrame over the same memory (about
+    a kilobyte of pandas objects, so it is not kept) and hands back the last
+    one built for as long as anything else still holds it.
+    """
+
+    __slots__ = ("index", "columns", "values", "shared_index", "_frame")
+
+    def __init__(self, index, columns, values, shared_index=True):
+        values = np.array(values, dtype="float64", order="C")
+        values.flags.writeable = False
+        self.index = intern_axis(index) if shared_index else index
+        self.columns = intern_axis(columns)
+        self.values = values
+        self.shared_index = shared_index
+        self._frame = None
+
+    def frame(self):
+        frame = self._frame() if self._frame is not None else None
+        if frame is None:
+            frame = pd.DataFrame(self.values, index=self.index, columns=self.columns, copy=False)
+            self._frame = weakref.ref(frame)
+        return frame
+
+    def __len__(self):
+        return len(self.index)
+
+    def __sizeof__(self):
+        size = object.__sizeof__(self) + sys.getsizeof(self.values)
+        return size if self.shared_index else size + int(self.index.memory_usage())
+
+    def __reduce__(self):
+        return FrameRecord, (self.index, self.columns, self.values, self.shared_index)
+
+
+class InfoRecord:
+    """An info dict cut down to the registered keys, on a shared key tuple."""
+
+    __slots__ = ("keys", "values")
+
+    def __init__(self, keys, values):
+        self.keys = intern_axis(keys, tuple)
+        self.values = tuple(values)
+
+    def mapping(self):
+        return dict(zip(self.keys, self.values))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __sizeof__(self):
+        # Short strings are interned and shared, so they are not counted
+        return object.__sizeof__(self) + sys.getsizeof(self.values) + sum(
+            estimate_size(value) for value in self.values
+            if not (isinstance(value, str) and len(value) <= MAX_INTERNED_STRING))
+
+    def __reduce__(self):
+        return InfoRecord, (self.keys, self.values)
+
+
+def numeric(values):
+    # Statements often come back as object columns; anything non-numeric becomes NaN
+    if values.dtype != object:
+        return values
+    return pd.to_numeric(values.ravel(), errors="coerce").reshape(values.shape)
+
+
+def frame_record(df, kind):
+    names = kept[kind]
+    if kind == HISTORY:
+        # Daily dates differ from ticker to ticker, so a history keeps its own index
+        columns = [column for column in df.columns if not names or column in names]
+        df = df.loc[:, columns]
+        return FrameRecord(df.index, columns, numeric(df.to_numpy()), shared_index=False)
+    # First occurrence of each kept row, in the provider's order
+    rows, positions = [], []
+    for position, row in enumerate(df.index.tolist()):
+        if (not names or row in names) and row not in rows:
+            rows.append(row)
+            positions.append(position)
+    return FrameRecord(rows, df.columns, numeric(df.to_numpy()[positions]))
+
+
+def trim(value, fields):
+    # Keep only the named keys of each dict in a list (company officers)
+    if not fields or not isinstance(value, list):
+        return value
+    return [{key: item[key] for key in fields if key in item} if isinstance(item, dict) else item for item in value]
+
+
+def info_record(info):
+    fields = {}
+    for name in kept[INFO]:
+        key, _, field = name.partition(".")
+        fields.setdefault(key, set())
+        if field:
+            fields[key].add(field)
+    keys = [key for key in info if not fields or key in fields]
+    values = []
+    for key in keys:
+        value = trim(info[key], sorted(fields.get(key, ())))
+        if isinstance(value, str) and len(value) <= MAX_INTERNED_STRING:
+            value = sys.intern(value)
+        values.append(value)
+    return InfoRecord(keys, values)
+
+
+def compact(dataset, value):
+    """The record kept in memory for a fetched dataset."""
+    if isinstance(value, dict):
+        return info_record(value)
+    if isinstance(value, pd.DataFrame):
+        return frame_record(value, kind_of(dataset))
+    return value
+
+
+def expand(value):
+    """What callers get back: a DataFrame or dict, as the provider returned it."""
+    if isinstance(value, FrameRecord):
+        return value.frame()
+    if isinstance(value, InfoRecord):
+        return value.mapping()
+    return value
+
+
+def digest(value):
+    """Content hash of a dataset as callers see it, for HTTP validators."""
+    h = hashlib.blake2b(digest_size=16)
+    if isinstance(value, pd.DataFrame):
+        index = value.index
+        h.update(index.asi8.tobytes() if isinstance(index, pd.DatetimeIndex) else repr(index.tolist()).encode())
+        h.update(repr(value.columns.tolist()).encode())
+        h.update(np.ascontiguousarray(numeric(value.to_numpy()), dtype="float64").tobytes())
+    else:
+        h.update(json.dumps(value, sort_keys=True, default=str).encode())
+    return h.digest()
+
+
+def stats():
+    with _axes_lock:
+        return {"interned_axes": len(_axes), "kept": {kind: len(names) for kind, names in kept.items()}}
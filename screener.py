@@ -0,0 +1,364 @@
+import ast
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+import fundamentals
+from derived import INPUTS, build_inputs, compute
+
+logger = logging.getLogger(__name__)
+
+# Ticker file (one per line) screened on top of everything in the store
+SCREENER_UNIVERSE = os.environ.get("SCREENER_UNIVERSE", "")
+# Fiscal years kept per ticker: period 0 is the latest, 1 the year before, ...
+SCREENER_PERIODS = int(os.environ.get("SCREENER_PERIODS", 5))
+# How often to look for tickers other workers have updated in the store
+SCREENER_RECHECK = float(os.environ.get("SCREENER_RECHECK", 30))
+SCREENER_MAX_PAGE = int(os.environ.get("SCREENER_MAX_PAGE", 500))
+SCREENER_MAX_EXPRESSION = 500
+
+STATEMENTS = fundamentals.STATEMENTS
+
+# Expression names for the derived metrics; the raw inputs keep their INPUTS names
+DERIVED_FIELDS = {
+    "gross_margin": "Gross Margin",
+    "operating_margin": "Operating Margin",
+    "net_margin": "Net Margin",
+    "revenue_growth": "Revenue Growth (YoY)",
+    "net_income_growth": "Net Income Growth (YoY)",
+    "revenue_cagr_3y": "Revenue CAGR (3Y)",
+    "net_debt_to_ebitda": "Net Debt / EBITDA",
+    "free_cash_flow": "Free Cash Flow",
+}
+FIELDS = [name for name in INPUTS if name not in DERIVED_FIELDS] + list(DERIVED_FIELDS)
+DEFAULT_FIELDS = ["revenue", "revenue_growth", "gross_margin", "operating_margin", "net_debt_to_ebitda",
+                  "free_cash_flow"]
+
+COMPARISONS = {
+    ast.Gt: np.greater, ast.GtE: np.greater_equal, ast.Lt: np.less,
+    ast.LtE: np.less_equal, ast.Eq: np.equal, ast.NotEq: np.not_equal,
+}
+ARITHMETIC = {ast.Add: np.add, ast.Sub: np.subtract, ast.Mult: np.multiply, ast.Div: np.divide}
+FUNCTIONS = {"abs": np.abs}
+
+
+class ScreenError(ValueError):
+    """A filter, sort or field expression that cannot be evaluated."""
+
+
+def to_periods(values, has, periods):
+    # Re-index (tickers, years) onto (tickers, periods) counting back from each
+    # ticker's own latest fiscal year, so companies with different year ends line up
+    rank = np.cumsum(has[:, ::-1], axis=1)[:, ::-1] - 1
+    rows, cols = np.nonzero(has & (rank < periods))
+    out = np.full((values.shape[0], periods), np.nan)
+    out[rows, rank[rows, cols]] = values[rows, cols]
+    return out
+
+
+def build_rows(frames_by_ticker, periods):
+    """Panel rows for the given tickers: (tickers, fiscal_years, {field: (tickers, periods)})."""
+    tickers, labels, annual, inputs = build_inputs(frames_by_ticker)
+    derived = compute(inputs, annual)
+    present = np.zeros((len(tickers), len(labels)), dtype=bool)
+    for values in inputs.values():
+        present |= ~np.isnan(values)
+    has = present & annual
+    years = np.array([int(label) if is_annual else 0 for label, is_annual in zip(labels, annual)], dtype=float)
+    fiscal_years = to_periods(np.broadcast_to(years, has.shape), has, periods)
+    columns = {name: to_periods(inputs[name], has, periods) for name in FIELDS if name not in DERIVED_FIELDS}
+    columns.update({name: to_periods(derived[metric], has, periods) for name, metric in DERIVED_FIELDS.items()})
+    return tickers, fiscal_years, columns
+
+
+class Panel:
+    """Immutable snapshot of the universe: one (tickers, periods) float64 array per field.
+
+    Refreshes build a new Panel, so a screen running on the old one is never
+    torn by a concurrent update.
+    """
+
+    def __init__(self, tickers, fiscal_years, columns, periods):
+        self.tickers = tickers
+        self.index = {ticker: i for i, ticker in enumerate(tickers)}
+        self.fiscal_years = fiscal_years
+        self.columns = columns
+        self.periods = periods
+        self.built_at = time.time()
+
+    @classmethod
+    def empty(cls, periods):
+        return cls([], np.full((0, periods), np.nan),
+                   {name: np.full((0, periods), np.nan) for name in FIELDS}, periods)
+
+    def update(self, frames_by_ticker):
+        # New snapshot with the given tickers' rows rebuilt and unseen tickers appended
+        tickers, fiscal_years, columns = build_rows(frames_by_ticker, self.periods)
+        added = [ticker for ticker in tickers if ticker not in self.index]
+        all_tickers = self.tickers + added
+        index = dict(self.index)
+        index.update({ticker: len(self.tickers) + i for i, ticker in enumerate(added)})
+        rows = np.array([index[ticker] for ticker in tickers], dtype=np.intp)
+
+        def merged(old, new):
+            out = np.full((len(all_tickers), self.periods), np.nan)
+            out[:len(self.tickers)] = old
+            out[rows] = new
+            return out
+
+        return Panel(all_tickers, merged(self.fiscal_years, fiscal_years),
+                     {name: merged(self.columns[name], columns[name]) for name in FIELDS}, self.periods)
+
+    def column(self, name, period=0):
+        if name not in self.columns:
+            raise ScreenError(f"Unknown field {name!r}; choose from {', '.join(FIELDS)}")
+        if not 0 <= period < self.periods:
+            raise ScreenError(f"Period {period} is out of range 0-{self.periods - 1}")
+        return self.columns[name][:, period]
+
+    def evaluate(self, expression):
+        """Evaluate an expression over every ticker at once.
+
+        Expressions are parsed, never eval'd: field names (optionally with a
+        period, revenue[1] is the year before the latest), numbers, + - * /,
+        comparisons, and/or/not and abs(). Missing values are NaN, so any
+        comparison involving them is False.
+        """
+        if len(expression) > SCREENER_MAX_EXPRESSION:
+            raise ScreenError("Expression is too long")
+        try:
+            tree = ast.parse(expression.strip(), mode="eval")
+        except SyntaxError:
+            raise ScreenError(f"Cannot parse {expression!r}") from None
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self._evaluate(tree.body)
+
+    def _evaluate(self, node):
+        if isinstance(node, ast.Name):
+            return self.column(node.id)
+        if isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name):
+            period = node.slice
+            if not (isinstance(period, ast.Constant) and type(period.value) is int):
+                raise ScreenError("A period must be a whole number, e.g. revenue[1]")
+            return self.column(node.value.id, period.value)
+        if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+            return np.float64(node.value)
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+            value = self._number(node.operand)
+            return -value if isinstance(node.op, ast.USub) else value
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+            return ~self._mask(node.operand)
+        if isinstance(node, ast.BinOp) and type(node.op) in ARITHMETIC:
+            return ARITHMETIC[type(node.op)](self._number(node.left), self._number(node.right))
+        if isinstance(node, ast.BoolOp):
+            masks = [self._mask(value) for value in node.values]
+            combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+            return combine.reduce(masks)
+        if isinstance(node, ast.Compare) and all(type(op) in COMPARISONS for op in node.ops):
+            mask = np.ones(len(self.tickers), dtype=bool)
+            left = self._number(node.left)
+            for op, comparator in zip(node.ops, node.comparators):
+                right = self._number(comparator)
+                mask &= COMPARISONS[type(op)](left, right)
+                left = right
+            return mask
+        if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in FUNCTIONS
+                and len(node.args) == 1 and not node.keywords):
+            return FUNCTIONS[node.func.id](self._number(node.args[0]))
+        raise ScreenError(f"Unsupported expression: {ast.unparse(node)!r}")
+
+    def _number(self, node):
+        value = self._evaluate(node)
+        if getattr(value, "dtype", None) == bool:
+            raise ScreenError(f"Expected a number, got a condition: {ast.unparse(node)!r}")
+        return np.broadcast_to(value, (len(self.tickers),))
+
+    def _mask(self, node):
+        value = self._evaluate(node)
+        if getattr(value, "dtype", None) != bool:
+            raise ScreenError(f"Expected a condition, got a number: {ast.unparse(node)!r}")
+        return value
+
+    def filter(self, where):
+        if not where.strip():
+            return np.ones(len(self.tickers), dtype=bool)
+        mask = self.evaluate(where)
+        if getattr(mask, "dtype", None) != bool:
+            raise ScreenError("The filter must be a condition, e.g. revenue_growth > 20")
+        return mask
+
+    def sort_key(self, key):
+        value = self.evaluate(key)
+        if getattr(value, "dtype", None) == bool:
+            raise ScreenError(f"Sort keys must be numbers: {key!r}")
+        return np.broadcast_to(value, (len(self.tickers),))
+
+    def parse_field(self, field):
+        # "name" or "name[period]"
+        name, _, period = field.partition("[")
+        try:
+            period = int(period.rstrip("]")) if period else 0
+        except ValueError:
+            raise ScreenError(f"Invalid field {field!r}") from None
+        self.column(name, period)
+        return name, period
+
+    def screen(self, where="", order="", fields=DEFAULT_FIELDS, page=1, per_page=50):
+        """(match count, one page of matching rows) ordered by the comma-separated sort keys.
+
+        Each sort key is an expression sorted ascending; prefix it with '-' for
+        descending. Missing values sort last, ties fall back to the ticker.
+        """
+        selected = [(field, self.parse_field(field)) for field in fields]
+        matches = np.nonzero(self.filter(where))[0]
+        keys = [key.strip() for key in order.split(",") if key.strip()]
+        if keys and len(matches):
+            sort_columns = [self.sort_key(key)[matches] for key in keys]
+            names = np.array(self.tickers, dtype=str)[matches]
+            # lexsort takes the primary key last; NaN sorts after every number
+            matches = matches[np.lexsort([names] + sort_columns[::-1])]
+        start = (page - 1) * per_page
+        results = []
+        for row in matches[start:start + per_page]:
+            fiscal_year = self.fiscal_years[row, 0]
+            values = {}
+            for field, (name, period) in selected:
+                value = self.columns[name][row, period]
+                values[field] = None if np.isnan(value) else round(float(value), 4)
+            results.append({
+                "ticker": self.tickers[row],
+                "fiscal_year": None if np.isnan(fiscal_year) else int(fiscal_year),
+                "values": values,
+            })
+        return len(matches), results
+
+
+def read_frames(ticker):
+    # Whatever copy is at hand, however old; screening never goes upstream
+    frames = {}
+    for dataset in STATEMENTS:
+        found = fundamentals.last_good(ticker, dataset)
+        frames[dataset] = found[0] if found is not None else None
+    return frames
+
+
+class Screener:
+    """Keeps a Panel of the universe current and screens it.
+
+    The universe is the SCREENER_UNIVERSE file, every ticker in the store and
+    every ticker this worker loads. Only tickers whose statements changed are
+    rebuilt: loads in this worker mark them dirty straight away, and every
+    recheck seconds the store's fetch times reveal updates from other workers.
+    Screens read the last finished panel while rebuilds run on a background
+    thread; only the first build is waited for.
+    """
+
+    def __init__(self, universe_path=SCREENER_UNIVERSE, periods=SCREENER_PERIODS, recheck=SCREENER_RECHECK,
+                 store=fundamentals.store, read=read_frames):
+        self.universe_path = universe_path
+        self.periods = periods
+        self.recheck = recheck
+        self.store = store
+        self.read = read
+        self.panel = None
+        self._versions = {}
+        self._dirty = set()
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        self._dirty_lock = threading.Lock()
+        self._building = False
+        self.refreshes = 0
+        self.rows_rebuilt = 0
+        self.last_refresh_seconds = 0.0
+
+    def mark_dirty(self, ticker, dataset):
+        if dataset in STATEMENTS:
+            with self._dirty_lock:
+                self._dirty.add(ticker)
+
+    def changed_tickers(self):
+        # Tickers that are new to the universe or whose stored statements were re-fetched
+        versions = self.store.versions() if self.store is not None else {}
+        universe = set(fundamentals.read_ticker_file(self.universe_path)) if self.universe_path else set()
+        universe.update(ticker for ticker, _ in versions)
+        changed = set()
+        for ticker in universe:
+            version = tuple(versions.get((ticker, dataset)) for dataset in STATEMENTS)
+            if self._versions.get(ticker, ()) != version:
+                self._versions[ticker] = version
+                changed.add(ticker)
+        return changed
+
+    def refresh(self, force=False):
+        with self._lock:
+            with self._dirty_lock:
+                changed, self._dirty = self._dirty, set()
+            now = time.monotonic()
+            if force or self.panel is None or now - self._checked >= self.recheck:
+                changed |= self.changed_tickers()
+                self._checked = now
+            panel = self.panel if self.panel is not None else Panel.empty(self.periods)
+            if changed or self.panel is None:
+                start = time.perf_counter()
+                panel = panel.update({ticker: self.read(ticker) for ticker in sorted(changed)})
+                self.last_refresh_seconds = time.perf_counter() - start
+                self.refreshes += 1
+                self.rows_rebuilt += len(changed)
+                if len(changed) > 100:
+                    logger.info("Screener rebuilt %d of %d tickers in %.2fs", len(changed), len(panel.tickers),
+                                self.last_refresh_seconds)
+                self.panel = panel
+            return panel
+
+    def current(self):
+        panel = self.panel
+        if panel is None:
+            return self.refresh()
+        with self._dirty_lock:
+            start = not self._building and (self._dirty or time.monotonic() - self._checked >= self.recheck)
+            if start:
+                self._building = True
+        if start:
+            threading.Thread(target=self.refresh_in_background, name="screener", daemon=True).start()
+        return panel
+
+    def refresh_in_background(self):
+        try:
+            self.refresh()
+        except Exception:
+            logger.exception("Screener refresh failed")
+        finally:
+            with self._dirty_lock:
+                self._building = False
+
+    def screen(self, where="", order="", fields=DEFAULT_FIELDS, page=1, per_page=50):
+        panel = self.current()
+        total, results = panel.screen(where, order, fields, page, per_page)
+        return {
+            "total": total,
+            "page": page,
+            "per_page": per_page,
+            "fields": list(fields),
+            "results": results,
+        }
+
+    def stats(self):
+        panel = self.panel
+        return {
+            "tickers": len(panel.tickers) if panel is not None else 0,
+            "periods": self.periods,
+            "fields": FIELDS,
+            "built_at": panel.built_at if panel is not None else None,
+            "building": self._building,
+            "refreshes": self.refreshes,
+            "rows_rebuilt": self.rows_rebuilt,
+            "last_refresh_seconds": round(self.last_refresh_seconds, 4),
+            "bytes": sum(column.nbytes for column in panel.columns.values()) if panel is not None else 0,
+        }
+
+
+screener = Screener()
+fundamentals.update_listeners.append(screener.mark_dirty)
@@ -0,0 +1,137 @@
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires_at REAL NOT NULL
+)
+"""
+
+
+class SharedCache:
+    """TTL key/value cache in a WAL-mode SQLite file shared by every worker on a host.
+
+    Values are pickled and written with a single INSERT OR REPLACE, so readers
+    in other processes see either the old or the new entry, never a torn one.
+    Lock contention and I/O errors degrade to cache misses.
+    """
+
+    def __init__(self, path, max_entries=20000, timeout=0.5, purge_every=256):
+        self.path = path
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.purge_every = purge_every
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(SCHEMA)
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_expires_at ON cache (expires_at)")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def get(self, key):
+        # Returns (value, expires_at) or None
+        try:
+            row = self._connect().execute(
+                "SELECT value, expires_at FROM cache WHERE key = ? AND expires_at > ?",
+                (key, time.time())).fetchone()
+        except sqlite3.Error as exc:
+            self._count("errors")
+            logger.warning("Shared cache read failed for %s: %r", key, exc)
+            return None
+        if row is None:
+            self._count("misses")
+            return None
+        self._count("hits")
+        return pickle.loads(row[0]), row[1]
+
+    def ttl_remaining(self, key):
+        try:
+            row = self._connect().execute("SELECT expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error:
+            return None
+        return None if row is None else max(0.0, row[0] - time.time())
+
+    def set(self, key, value, ttl):
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                             (key, payload, time.time() + ttl))
+        except sqlite3.Error as exc:
+            self._count("errors")
+            logger.warning("Shared cache write failed for %s: %r", key, exc)
+            return
+        with self._lock:
+            self._writes += 1
+            purge = self._writes % self.purge_every == 0
+        if purge:
+            self.purge()
+
+    def delete(self, key):
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+        except sqlite3.Error as exc:
+            self._count("errors")
+            logger.warning("Shared cache delete failed for %s: %r", key, exc)
+
+    def purge(self):
+        # Drop expired rows, then the soonest-to-expire ones beyond max_entries
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+                conn.execute(
+                    "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,))
+        except sqlite3.Error as exc:
+            self._count("errors")
+            logger.warning("Shared cache purge failed: %r", exc)
+
+    def stats(self):
+        try:
+            entries, size = self._connect().execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM cache").fetchone()
+        except sqlite3.Error:
+            entries, size = None, None
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "path": self.path,
+                "pid": os.getpid(),
+                "entries": entries,
+                "bytes": size,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "errors": self.errors,
+            }
@@ -0,0 +1,136 @@
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS datasets (
+    ticker TEXT NOT NULL,
+    dataset TEXT NOT NULL,
+    payload BLOB NOT NULL,
+    latest_period TEXT,
+    has_ttm INTEGER NOT NULL DEFAULT 0,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (ticker, dataset)
+)
+"""
+
+YEAR = 365 * 86400
+QUARTER = 92 * 86400
+
+
+class StoredDataset:
+    __slots__ = ("value", "fresh", "fetched_at")
+
+    def __init__(self, value, fresh, fetched_at):
+        self.value = value
+        self.fresh = fresh
+        self.fetched_at = fetched_at
+
+
+def latest_period(df):
+    periods = [c for c in df.columns if hasattr(c, "year")]
+    return max(periods) if periods else None
+
+
+class FundamentalsStore:
+    """SQLite store for yfinance info dicts, statement frames and price history.
+
+    Statements are only due for a re-download once the fiscal year (quarter,
+    for the quarterly frames) after the newest stored period has ended (then
+    every recheck_interval until the new column shows up), quarterly when the
+    frame carries a TTM column, and after max_age as a backstop for
+    restatements. Price history is due after history_max_age.
+    """
+
+    def __init__(self, path, info_max_age=3600, recheck_interval=86400, max_age=90 * 86400, history_max_age=3600):
+        self.path = path
+        self.info_max_age = info_max_age
+        self.history_max_age = history_max_age
+        self.recheck_interval = recheck_interval
+        self.max_age = max_age
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(SCHEMA)
+
+    def _connect(self):
+        # One connection per thread, reopened after a fork (gunicorn --preload)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def is_fresh(self, dataset, latest, has_ttm, fetched_at, now):
+        age = now - fetched_at
+        if dataset == "info":
+            return age < self.info_max_age
+        if dataset == "history":
+            return age < self.history_max_age
+        if age >= self.max_age or (has_ttm and age >= QUARTER):
+            return False
+        # Until the period after the newest one has closed, no new column can
+        # exist; after that, poll every recheck_interval
+        period = QUARTER if dataset.startswith("quarterly_") else YEAR
+        if latest is not None and now < pd.Timestamp(latest).timestamp() + period:
+            return True
+        return age < self.recheck_interval
+
+    def read(self, ticker, dataset, now=None):
+        now = time.time() if now is None else now
+        row = self._connect().execute(
+            "SELECT payload, latest_period, has_ttm, fetched_at FROM datasets "
+            "WHERE ticker = ? AND dataset = ?", (ticker, dataset)).fetchone()
+        if row is None:
+            return None
+        payload, latest, has_ttm, fetched_at = row
+        value = json.loads(payload) if dataset == "info" else pickle.loads(payload)
+        # Empty rows are no longer written; one left by an older version is never fresh
+        fresh = len(value) > 0 and self.is_fresh(dataset, latest, has_ttm, fetched_at, now)
+        return StoredDataset(value, fresh, fetched_at)
+
+    def write(self, ticker, dataset, value, now=None):
+        now = time.time() if now is None else now
+        if dataset == "info":
+            payload, latest, has_ttm = json.dumps(value, default=str), None, 0
+        else:
+            payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            latest = latest_period(value)
+            latest = latest.isoformat() if latest is not None else None
+            has_ttm = int(any(str(c).upper() == "TTM" for c in value.columns))
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO datasets "
+                "(ticker, dataset, payload, latest_period, has_ttm, fetched_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (ticker, dataset, payload, latest, has_ttm, now))
+
+    def due(self, ticker, dataset, now=None):
+        now = time.time() if now is None else now
+        row = self._connect().execute(
+            "SELECT latest_period, has_ttm, fetched_at FROM datasets "
+            "WHERE ticker = ? AND dataset = ?", (ticker, dataset)).fetchone()
+        return row is None or not self.is_fresh(dataset, *row, now)
+
+    def versions(self):
+        # {(ticker, dataset): fetched_at} for every stored dataset, to spot what changed
+        rows = self._connect().execute("SELECT ticker, dataset, fetched_at FROM datasets")
+        return {(ticker, dataset): fetched_at for ticker, dataset, fetched_at in rows}
+
+    def tickers(self):
+        rows = self._connect().execute("SELECT DISTINCT ticker FROM datasets ORDER BY ticker")
+        return [row[0] for row in rows]
+
+    def stats(self):
+        count, size = self._connect().execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(payload)), 0) FROM datasets").fetchone()
+        return {"path": self.path, "datasets": count, "tickers": len(self.tickers()), "payload_bytes": size}
@@ -0,0 +1,257 @@
+import bisect
+import logging
+import os
+import re
+import threading
+import time
+
+import fundamentals
+import records
+
+logger = logging.getLogger(__name__)
+
+# Symbol list behind ticker suggestions: one "SYMBOL,Company name" per line
+# (tab- or |-separated files such as Nasdaq Trader's symbol directories work
+# too); `flask symbols fetch` writes it. Once it exists, tickers that are
+# neither in it nor in the store are turned away before any upstream call;
+# exchange-suffixed, index and currency symbols, which US lists leave out,
+# always go through.
+SYMBOLS_PATH = os.environ.get("SYMBOLS_PATH", os.path.join(fundamentals.DATA_DIR, "symbols.txt"))
+# How often workers look for a rewritten symbol list (seconds)
+SYMBOLS_RECHECK = float(os.environ.get("SYMBOLS_RECHECK", 60))
+SUGGEST_LIMIT = int(os.environ.get("SUGGEST_LIMIT", 10))
+# Name words looked at per query, so a one-letter prefix costs about the same as a long one
+SUGGEST_SCAN = 500
+MAX_QUERY = 64
+
+# Yahoo symbols: BRK-B, RELIANCE.NS, ^GSPC, EURUSD=X
+TICKER_PATTERN = re.compile(r"[A-Z0-9^][A-Z0-9.\-=^]{0,14}")
+# Share classes use "-" in Yahoo's spelling, so "." only ever starts an exchange suffix
+UNLISTED_MARKS = ".^="
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+records.keep(records.INFO, ["shortName"])
+
+
+def words(name):
+    return WORD_PATTERN.findall(name.lower())
+
+
+def read_symbol_file(path):
+    # {ticker: name}; header, comment and footer lines fail the ticker pattern
+    names = {}
+    with open(path, encoding="utf-8", errors="replace") as fh:
+        for line in fh:
+            line = line.split("#", 1)[0].strip()
+            # Split on the first separator kind the line uses, so commas in names survive
+            separator = next((sep for sep in "|\t," if sep in line), ",")
+            fields = line.split(separator, 2)
+            ticker = fields[0].strip().strip('"').upper()
+            if ticker not in ("SYMBOL", "TICKER") and TICKER_PATTERN.fullmatch(ticker):
+                names.setdefault(ticker, fields[1].strip().strip('"') if len(fields) > 1 else "")
+    return names
+
+
+def symbol_directory(text):
+    """{ticker: name} from a Nasdaq Trader symbol directory (nasdaqlisted.txt, otherlisted.txt).
+
+    Symbols are turned into Yahoo's form (BRK.B -> BRK-B); test issues and
+    symbols Yahoo spells differently (preferreds, warrants with $ or +) are
+    left out, as is the " - Common Stock" style suffix of the names.
+    """
+    lines = text.splitlines()
+    if not lines:
+        return {}
+    header = lines[0].split("|")
+    test = header.index("Test Issue") if "Test Issue" in header else None
+    name = header.index("Security Name")
+    names = {}
+    for line in lines[1:]:
+        fields = line.split("|")
+        if len(fields) != len(header) or (test is not None and fields[test] == "Y"):
+            continue
+        ticker = fields[0].strip().upper().replace(".", "-")
+        if TICKER_PATTERN.fullmatch(ticker):
+            names.setdefault(ticker, fields[name].split(" - ")[0].strip())
+    return names
+
+
+def write_symbol_file(path, names):
+    # Replaced in one step, so workers reloading it never read half a file
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temporary = path + ".tmp"
+    with open(temporary, "w", encoding="utf-8") as fh:
+        for ticker in sorted(names):
+            fh.write(f"{ticker}|{names[ticker]}\n")
+    os.replace(temporary, path)
+
+
+class SymbolIndex:
+    """Tickers and company names in sorted lists, searched by prefix with bisect.
+
+    tickers is sorted, and words holds a (word, ticker) pair for every word
+    of every company name, also sorted, so whatever starts with a prefix is
+    one contiguous run found with a single bisect. Tickers loaded later are
+    added in place with insort.
+    """
+
+    def __init__(self, names=None, listed=0):
+        names = dict(names or {})
+        self.names = names
+        # Symbols that came from the list file; with none, every well-formed ticker is let through
+        self.listed = listed
+        self.name_words = {ticker: tuple(set(words(name))) for ticker, name in names.items()}
+        self.tickers = sorted(names)
+        self.words = sorted((word, ticker) for ticker, name_words in self.name_words.items() for word in name_words)
+        self._lock = threading.Lock()
+
+    def __contains__(self, ticker):
+        return ticker in self.names
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, ticker, name=""):
+        with self._lock:
+            old = self.names.get(ticker)
+            if old is None:
+                bisect.insort(self.tickers, ticker)
+                old = ""
+            if old == name or (old and not name):
+                self.names.setdefault(ticker, name)
+                self.name_words.setdefault(ticker, ())
+                return
+            for word in self.name_words.get(ticker, ()):
+                del self.words[bisect.bisect_left(self.words, (word, ticker))]
+            self.names[ticker] = name
+            self.name_words[ticker] = tuple(set(words(name)))
+            for word in self.name_words[ticker]:
+                bisect.insort(self.words, (word, ticker))
+
+    def run(self, prefix):
+        # (start, end) of the name words beginning with prefix
+        return (bisect.bisect_left(self.words, (prefix,)), bisect.bisect_left(self.words, (prefix + "\uffff",)))
+
+    def suggest(self, query, limit=SUGGEST_LIMIT):
+        """Up to limit {"ticker", "name"}: ticker prefix matches, then names with every query word."""
+        query = query[:MAX_QUERY]
+        prefix = query.strip().upper()
+        wanted = words(query)
+        found = []
+        with self._lock:
+            if prefix:
+                start = bisect.bisect_left(self.tickers, prefix)
+                for ticker in self.tickers[start:start + limit]:
+                    if not ticker.startswith(prefix):
+                        break
+                    found.append(ticker)
+            if wanted and len(found) < limit:
+                # Walk the shortest run of name words; the other query words must start some word of the name
+                runs = sorted((end - start, start, word) for word in set(wanted) for start, end in [self.run(word)])
+                size, start, _ = runs[0]
+                others = [word for _, _, word in runs[1:]]
+                for _, ticker in self.words[start:start + min(size, SUGGEST_SCAN)]:
+                    if len(found) >= limit:
+                        break
+                    if ticker in found:
+                        continue
+                    if others and not all(any(part.startswith(other) for part in self.name_words[ticker])
+                                          for other in others):
+                        continue
+                    found.append(ticker)
+            return [{"ticker": ticker, "name": self.names[ticker]} for ticker in found]
+
+    def stats(self):
+        with self._lock:
+            return {"tickers": len(self.tickers), "listed": self.listed, "words": len(self.words),
+                    "path": SYMBOLS_PATH or None}
+
+
+def list_mtime(path=SYMBOLS_PATH):
+    try:
+        return os.path.getmtime(path) if path else None
+    except OSError:
+        return None
+
+
+def build_index(path=SYMBOLS_PATH, store=fundamentals.store, previous=None):
+    names = {}
+    if list_mtime(path) is not None:
+        try:
+            names = read_symbol_file(path)
+        except OSError as exc:
+            logger.warning("Cannot read symbol list %s: %r", path, exc)
+    listed = len(names)
+    if store is not None:
+        for ticker in store.tickers():
+            names.setdefault(ticker, "")
+    if previous is not None:
+        # Keep what this worker learned from loads since the last build
+        for ticker, name in previous.names.items():
+            names.setdefault(ticker, name)
+    return SymbolIndex(names, listed)
+
+
+index = build_index()
+_mtime = list_mtime()
+_checked = time.monotonic()
+_reload_lock = threading.Lock()
+
+
+def current():
+    # The index, rebuilt when `flask symbols fetch` (or anything else) rewrote the list
+    global index, _mtime, _checked
+    if time.monotonic() - _checked < SYMBOLS_RECHECK:
+        return index
+    with _reload_lock:
+        if time.monotonic() - _checked >= SYMBOLS_RECHECK:
+            mtime = list_mtime()
+            if mtime != _mtime:
+                index = build_index(previous=index)
+                _mtime = mtime
+                logger.info("Symbol list reloaded: %d symbols", index.listed)
+            _checked = time.monotonic()
+    return index
+
+
+def accepted(ticker):
+    # Worth a trip upstream: a well-formed symbol that, once a list is in place, is known
+    # or is of a kind the list cannot cover
+    if not TICKER_PATTERN.fullmatch(ticker):
+        return False
+    if any(mark in ticker for mark in UNLISTED_MARKS):
+        return True
+    symbols = current()
+    return not symbols.listed or ticker in symbols
+
+
+def split_accepted(tickers):
+    # (accepted, rejected), each in the order given
+    verdicts = [(ticker, accepted(ticker)) for ticker in tickers]
+    return [t for t, ok in verdicts if ok], [t for t, ok in verdicts if not ok]
+
+
+def suggest(query, limit=SUGGEST_LIMIT):
+    return current().suggest(query, limit)
+
+
+def near(ticker, limit=5):
+    # Symbols sharing the longest prefix with a mistyped one
+    ticker = re.sub(r"[^A-Z0-9.\-=^]", "", ticker)
+    for end in range(len(ticker), 0, -1):
+        found = suggest(ticker[:end], limit)
+        if found:
+            return found
+    return []
+
+
+def remember_name(ticker, dataset):
+    # Tickers that load with a company name become suggestions under it
+    if dataset == "info":
+        info = fundamentals.lookup(ticker, "info")
+        name = info.get("shortName") if info else None
+        if name:
+            current().add(ticker, name)
+
+
+fundamentals.update_listeners.append(remember_name)
@@ -0,0 +1,192 @@
+import numpy as np
+import pandas as pd
+
+
+def format_number(val):
+    if val is None:
+        return "N/A"
+    try:
+        val = float(val)
+    except:
+        return str(val)
+    abs_val = abs(val)
+    if abs_val >= 1_000_000_000_000:
+        return f"{val / 1_000_000_000_000:.2f} Tn"
+    elif abs_val >= 1_000_000_000:
+        return f"{val / 1_000_000_000:.2f} Bn"
+    elif abs_val >= 1_000_000:
+        return f"{val / 1_000_000:.2f} Mn"
+    elif abs_val >= 100_000:
+        return f"{int(val // 10000 * 10000):,}"
+    elif abs_val >= 10_000:
+        return f"{int(val // 1000 * 1000):,}"
+    elif abs_val >= 1_000:
+        return f"{int(val // 100 * 100):,}"
+    elif abs_val >= 100:
+        return f"{int(val // 10 * 10):,}"
+    else:
+        return f"{val:.1f}"
+
+
+def _scale(divisor):
+    return lambda values: values / divisor
+
+
+def _floor_to(step):
+    return lambda values: np.floor_divide(values, step) * step
+
+
+# Same buckets as format_number, largest first: (lower bound of |value|, transform, format)
+FORMAT_BUCKETS = [
+    (1_000_000_000_000, _scale(1_000_000_000_000), "{:.2f} Tn"),
+    (1_000_000_000, _scale(1_000_000_000), "{:.2f} Bn"),
+    (1_000_000, _scale(1_000_000), "{:.2f} Mn"),
+    (100_000, _floor_to(10000), "{:,.0f}"),
+    (10_000, _floor_to(1000), "{:,.0f}"),
+    (1_000, _floor_to(100), "{:,.0f}"),
+    (100, _floor_to(10), "{:,.0f}"),
+    (-np.inf, lambda values: values, "{:.1f}"),
+]
+
+
+def format_numbers(values):
+    # Vectorized format_number over a float array; NaN becomes "N/A".
+    # Each bucket is selected with one mask and formatted in a single pass.
+    values = np.asarray(values, dtype="float64")
+    out = np.full(values.shape, "N/A", dtype=object)
+    remaining = ~np.isnan(values)
+    abs_values = np.abs(values)
+    for bound, transform, fmt in FORMAT_BUCKETS:
+        mask = remaining & (abs_values >= bound)
+        if mask.any():
+            out[mask] = list(map(fmt.format, transform(values[mask])))
+            remaining &= ~mask
+    return out
+
+
+def chart_values(values):
+    # Chart series in millions rounded to 2 dp; missing and zero values become None
+    values = np.asarray(values, dtype="float64")
+    scaled = np.round(values / 1e6, 2)
+    return np.where(np.isnan(values) | (values == 0), None, scaled)
+
+
+def year_labels(columns):
+    return [str(c.year) if hasattr(c, "year") else str(c) for c in columns]
+
+
+def sorted_years(lst):
+    ttm = [y for y in lst if y.upper() == 'TTM']
+    nums = [y for y in lst if y.upper() != 'TTM']
+    nums_sorted = sorted(nums, key=lambda x: int(x))
+    return nums_sorted + ttm
+
+
+def quarter_labels(columns):
+    # Calendar quarter each period ends in, e.g. "2024 Q3"
+    return [f"{c.year} Q{(c.month - 1) // 3 + 1}" for c in columns]
+
+
+def extract_metrics(df, metrics, labels=None):
+    # Returns (years, values) with every metric selected in one reindex:
+    # values is a float array of shape (len(metrics), len(years)), NaN where missing.
+    # Columns are fiscal years sorted with TTM last, unless labels names them in order.
+    if labels is None:
+        labels = year_labels(df.columns)
+        years = sorted_years(labels)
+        order = [labels.index(y) for y in years]
+    else:
+        years, order = list(labels), list(range(len(labels)))
+    if df.index.has_duplicates:
+        df = df[~df.index.duplicated()]
+    frame = df.reindex(list(metrics.values()))
+    if (frame.dtypes == object).any():
+        frame = frame.apply(pd.to_numeric, errors="coerce")
+    values = frame.to_numpy(dtype="float64", na_value=np.nan)
+    return years, values[:, order]
+
+
+def transform_section(df, metrics, labels=None):
+    # Batched replacement for the per-metric to_dict/format_dict/chart_data loop
+    years, values = extract_metrics(df, metrics, labels)
+    names = list(metrics)
+    raw = np.where(np.isnan(values), None, values).tolist()
+    formatted = format_numbers(values).tolist()
+    charts = chart_values(values).tolist()
+    return {
+        "years": years,
+        "values": values,
+        "raw": dict(zip(names, raw)),
+        "formatted": dict(zip(names, formatted)),
+        "charts": dict(zip(names, charts)),
+    }
+
+
+def lttb(x, y, points):
+    """Indices of a Largest-Triangle-Three-Buckets downsample of (x, y) to `points` points.
+
+    Keeps the first and last point, then from each of points - 2 equal buckets
+    the point forming the largest triangle with the previously kept point and
+    the mean of the next bucket, so peaks and troughs survive the cut.
+    """
+    n = len(x)
+    if points >= n or points < 3:
+        return np.arange(n)
+    every = (n - 2) / (points - 2)
+    kept = np.empty(points, dtype=np.intp)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for i in range(points - 2):
+        start, end = int(i * every) + 1, int((i + 1) * every) + 1
+        next_start, next_end = end, min(int((i + 2) * every) + 1, n)
+        mean_x, mean_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        area = np.abs((x[a] - mean_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (mean_y - y[a]))
+        a = start + int(np.argmax(area))
+        kept[i + 1] = a
+    return kept
+
+
+PRICE_ROWS = ("Last Close", "High", "Low", "Change", "Avg Daily Volume")
+
+
+def transform_prices(df, years, points):
+    """Daily price history over the last `years` years, shaped like transform_section().
+
+    The table is one summary column for the window; the close series is
+    LTTB-downsampled to at most `points` points, so the payload does not grow
+    with the span requested. labels holds the chart's dates.
+    """
+    closes = df["Close"].dropna() if "Close" in df else pd.Series(dtype="float64")
+    if closes.empty:
+        return {"years": [], "labels": [], "raw": {row: [] for row in PRICE_ROWS},
+                "formatted": {row: [] for row in PRICE_ROWS}, "charts": {"Close": []}}
+    try:
+        start = closes.index[-1] - pd.DateOffset(years=years)
+    except (ValueError, OverflowError):
+        # Further back than a timestamp goes: the whole series
+        start = closes.index[0]
+    window = closes[closes.index >= start]
+    values = window.to_numpy(dtype="float64")
+    volume = df["Volume"].reindex(window.index).mean() if "Volume" in df else np.nan
+    summary = {
+        "Last Close": values[-1],
+        "High": values.max(),
+        "Low": values.min(),
+        "Change": (values[-1] / values[0] - 1) * 100 if values[0] else np.nan,
+        "Avg Daily Volume": volume,
+    }
+    formatted = {
+        row: "N/A" if np.isnan(value) else
+        f"{value:+.1f}%" if row == "Change" else
+        format_number(value) if row == "Avg Daily Volume" else f"{value:,.2f}"
+        for row, value in summary.items()
+    }
+    days = ((window.index - window.index[0]) / pd.Timedelta(days=1)).to_numpy(dtype="float64")
+    kept = lttb(days, values, points)
+    return {
+        "years": [f"{window.index[0]:%Y-%m-%d} to {window.index[-1]:%Y-%m-%d}"],
+        "labels": [f"{date:%Y-%m-%d}" for date in window.index[kept]],
+        "raw": {row: [None if np.isnan(value) else float(value)] for row, value in summary.items()},
+        "formatted": {row: [value] for row, value in formatted.items()},
+        "charts": {"Close": np.round(values[kept], 2).tolist()},
+    }